@@ -1,19 +1,19 @@
 import streamlit as st
 import datetime
 import numpy as np
-import pandas as pd
 import warnings
 
 from config import (
     INITIAL_INVESTMENT, UNIT_INVESTMENT, MAX_BUY_TIMES,
     BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END, BUY_NEXT_PERCENT_STEP,
-    SELL_PERCENT_START, SELL_PERCENT_END, SELL_PERCENT_STEP
+    SELL_PERCENT_START, SELL_PERCENT_END, SELL_PERCENT_STEP,
+    ADAPTIVE_FINE_STEP
 )
 from logger import logger
-from data_loader import load_ticker_info, load_etf_ticker_info, get_market_cap, load_market_data
-from strategy import run_backtest
+from data_loader import load_ticker_search_index, sort_tickers_by_market_cap, load_market_data
+from optimizer import optimize_grid, adaptive_grid_search, get_grid_result_cache, get_grid_checkpoint_store
 from visualization import plot_candlestick_with_signals, plot_portfolio_value
-from database import insert_backtest_result, fetch_recent_searches
+from database import submit_backtest_result, fetch_recent_searches
 
 warnings.filterwarnings("ignore", message="findfont: Font family 'Malgun Gothic' not found.")
 
@@ -31,19 +31,10 @@ target_ticker = None
 ticker_name = None
 if search_query:
     if instrument_type == "주식":
-        ticker_info = load_ticker_info()
-        filtered_tickers = {
-            code: name
-            for code, name in ticker_info.items()
-            if search_query.lower() in name.lower() or search_query in code
-        }
+        filtered_tickers = dict(load_ticker_search_index(instrument_type).search(search_query))
         if filtered_tickers:
             today_str = datetime.datetime.today().strftime("%Y%m%d")
-            sorted_filtered_tickers = sorted(
-                filtered_tickers.items(),
-                key=lambda x: get_market_cap(x[0], today_str),
-                reverse=True
-            )
+            sorted_filtered_tickers = sort_tickers_by_market_cap(filtered_tickers, today_str)
             selected = st.sidebar.selectbox(
                 "📋 검색 결과",
                 sorted_filtered_tickers,
@@ -54,14 +45,8 @@ if search_query:
         else:
             st.sidebar.write("❌ 검색 결과가 없습니다.")
     else:
-        ticker_info = load_etf_ticker_info()
-        filtered_tickers = {
-            code: name
-            for code, name in ticker_info.items()
-            if search_query.lower() in name.lower() or search_query in code
-        }
-        if filtered_tickers:
-            sorted_filtered_tickers = sorted(filtered_tickers.items(), key=lambda x: x[0])
+        sorted_filtered_tickers = load_ticker_search_index(instrument_type).search(search_query)
+        if sorted_filtered_tickers:
             selected = st.sidebar.selectbox(
                 "📋 검색 결과",
                 sorted_filtered_tickers,
@@ -81,6 +66,7 @@ st.sidebar.header('⚙️ 기초 설정')
 initial_investment = st.sidebar.number_input('💰 총 투자금액', value=INITIAL_INVESTMENT, step=100000)
 unit_investment = st.sidebar.number_input('📌 1차수당 금액', value=UNIT_INVESTMENT, step=50000)
 max_buy_times = st.sidebar.number_input('🔁 최대 매수 횟수', value=MAX_BUY_TIMES, min_value=1, step=1)
+fine_search = st.sidebar.checkbox(f'🔬 정밀 탐색 ({ADAPTIVE_FINE_STEP}% 단위)', help='거친 그리드 결과의 상위 조합 주변만 좁혀 가며 탐색합니다.')
 
 # ----------------------------
 # 사이드바: 날짜 범위 설정
@@ -120,59 +106,49 @@ if st.sidebar.button('🚀 백테스트 실행'):
         st.error(f'❗ 데이터를 가져오는 중 오류 발생: {e}')
         st.stop()
 
-    # 매개변수 그리드에 따른 백테스트 실행
-    results = []
-    total_iterations = int(
-        len(np.arange(BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END + BUY_NEXT_PERCENT_STEP, BUY_NEXT_PERCENT_STEP)) *
-        len(np.arange(SELL_PERCENT_START, SELL_PERCENT_END + SELL_PERCENT_STEP, SELL_PERCENT_STEP))
-    )
-    iteration = 0
+    # 매개변수 그리드에 따른 백테스트 실행 (모든 조합을 한 번의 순회로 계산)
+    buy_grid = np.arange(BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END + BUY_NEXT_PERCENT_STEP, BUY_NEXT_PERCENT_STEP)
+    sell_grid = np.arange(SELL_PERCENT_START, SELL_PERCENT_END + SELL_PERCENT_STEP, SELL_PERCENT_STEP)
     progress_bar = st.progress(0)
+    if fine_search:
+        # 거친 그리드 -> 상위 조합 주변을 ADAPTIVE_FINE_STEP 간격까지 좁혀 가며 탐색
+        result = adaptive_grid_search(
+            df, initial_investment, unit_investment, max_buy_times,
+            (BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END), (SELL_PERCENT_START, SELL_PERCENT_END),
+            (BUY_NEXT_PERCENT_STEP, SELL_PERCENT_STEP), progress_callback=progress_bar.progress
+        )
+        st.write(f"🔬 정밀 탐색: {result['evaluations']}개 조합 평가 (전체 그리드 {result['exhaustive_evaluations']}개)")
+    else:
+        # 같은 데이터/설정/그리드로 이미 계산한 결과는 캐시에서 바로 가져오고,
+        # 같은 시작일로 종료일만 늘어난 실행은 저장된 상태에서 새 봉만 이어서 계산합니다. (조합이 많으면 멀티 프로세스로 실행)
+        result = optimize_grid(
+            df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+            progress_callback=progress_bar.progress, cache=get_grid_result_cache(),
+            checkpoint_id=f"{instrument_type}:{target_ticker}", checkpoint_store=get_grid_checkpoint_store()
+        )
+    returns = result['returns']
+    max_return = result['max_return']
+    optimal_buy_next_percent = result['optimal_buy_next_percent']
+    optimal_sell_percent = result['optimal_sell_percent']
+    trade_history = result['trade_history']
+    final_value = result['final_value']
+    # 포트폴리오 가치 변화 (그리드 실행 중 기록한 최적 조합의 거래로 계산됨)
+    dates = result['portfolio_dates']
+    portfolio_values = result['portfolio_values']
     
-    for buy_next_percent in np.arange(BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END + BUY_NEXT_PERCENT_STEP, BUY_NEXT_PERCENT_STEP):
-        for sell_percent in np.arange(SELL_PERCENT_START, SELL_PERCENT_END + SELL_PERCENT_STEP, SELL_PERCENT_STEP):
-            iteration += 1
-            trade_history, final_value, total_return = run_backtest(
-                df, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent
-            )
-            results.append({
-                '매수 갭 %': buy_next_percent,
-                '매도 %': sell_percent,
-                '총 수익률 (%)': total_return
-            })
-            progress_bar.progress(iteration / total_iterations)
-    
-    results_df = pd.DataFrame(results)
-    pivot_table = results_df.pivot(index='매수 갭 %', columns='매도 %', values='총 수익률 (%)').astype(float).round(2)
+    pivot_table = returns.astype(float).round(2)
     pivot_table.columns = [f'매도 {col}%' for col in pivot_table.columns]
     
-    # 최적 파라미터 도출
-    max_return = results_df['총 수익률 (%)'].max()
-    optimal_row = results_df.loc[results_df['총 수익률 (%)'] == max_return].iloc[0]
-    optimal_buy_next_percent = optimal_row['매수 갭 %']
-    optimal_sell_percent = optimal_row['매도 %']
-    
-    # 최적 파라미터로 다시 백테스트 실행 (매매 내역 기록)
-    trade_history, final_value, total_return = run_backtest(
-        df, initial_investment, unit_investment, max_buy_times, optimal_buy_next_percent, optimal_sell_percent
-    )
-    
-    # 포트폴리오 가치 변화 계산: trade_history를 반영하여 각 날짜별 cash와 holdings 업데이트
-    from strategy import compute_portfolio_history  # 새로 추가한 함수
-    dates, portfolio_values = compute_portfolio_history(df, trade_history, initial_investment)
-    
     # 시각화
     fig_candle = plot_candlestick_with_signals(df, trade_history, target_ticker)
     fig_portfolio = plot_portfolio_value(dates, portfolio_values)
     
     # 매매 내역 DataFrame
-    trade_history_df = pd.DataFrame(trade_history)
-    if not trade_history_df.empty:
-        trade_history_df.set_index('Date', inplace=True)
+    trade_history_df = trade_history.to_frame()
     
     
     
-    # Supabase DB에 결과 저장
+    # Supabase DB에 결과 저장 (백그라운드에서 묶어서 저장)
     insert_data = {
         'instrument_type': instrument_type,
         'target_ticker': target_ticker,
@@ -187,7 +163,7 @@ if st.sidebar.button('🚀 백테스트 실행'):
         'max_return': max_return,
         'final_portfolio_value': final_value
     }
-    insert_backtest_result(insert_data)
+    submit_backtest_result(insert_data)
     
     # 백테스트 결과를 세션 상태에 저장 (추후 탭에서 활용)
     st.session_state['backtest_output'] = {
@@ -227,10 +203,8 @@ with tabs[0]:
         
 with tabs[1]:
     st.subheader("📝 다른 사용자의 최근 검색 내역")
-    recent_searches = fetch_recent_searches(limit=20)  # 중복을 고려하여 더 많은 데이터를 요청할 수 있음
-    if recent_searches:
-        df_recent = pd.DataFrame(recent_searches)
-        df_recent = df_recent.drop_duplicates().head(20)  # 중복 항목 제거 후 상위 5개만 보여줌
+    df_recent = fetch_recent_searches(limit=20)  # (종목, 기간) 중복 제거된 최신 20건, 세션 간 공유 캐시
+    if not df_recent.empty:
         st.dataframe(df_recent)
     else:
         st.write("최근 검색 내역이 없습니다.")
@@ -0,0 +1,101 @@
+# checkpoint.py
+# 그리드 백테스트 상태 체크포인트 (봉이 추가되면 저장된 상태부터 이어서 실행)
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from config import COMMISSION_RATE, TRANSACTION_TAX_RATE
+
+# 상태 구조나 백테스트 로직이 바뀌면 올려서 이전 체크포인트를 무효화합니다.
+_CHECKPOINT_VERSION = 1
+
+
+def checkpoint_key(series_id, df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid):
+    """
+    체크포인트 키(sha256 hex)를 만듭니다.
+    종목(series_id), 시작 날짜, 투자 설정, 그리드가 같으면 종료 날짜와 상관없이 같은 키가 나옵니다.
+    """
+    h = hashlib.sha256()
+    h.update(repr((_CHECKPOINT_VERSION, series_id, COMMISSION_RATE, TRANSACTION_TAX_RATE,
+                   float(initial_investment), float(unit_investment), int(max_buy_times),
+                   str(df.index[0]))).encode())
+    for grid in (buy_grid, sell_grid):
+        grid = np.ascontiguousarray(grid, dtype=np.float64)
+        h.update(len(grid).to_bytes(8, "little"))
+        h.update(grid.tobytes())
+    return h.hexdigest()
+
+
+def prefix_fingerprint(df, n_bars):
+    """
+    앞쪽 n_bars개 봉(날짜, 고가/저가/종가)의 지문입니다.
+    수정주가 반영 등으로 과거 봉이 바뀌면 값이 달라지므로 체크포인트를 쓸 수 있는지 확인하는 데 씁니다.
+    """
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(df.index.values[:n_bars].astype("M8[ns]")).tobytes())
+    for col in ('고가', '저가', '종가'):
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)[:n_bars]).tobytes())
+    return h.hexdigest()
+
+
+class GridCheckpointStore:
+    """
+    그리드 상태(new_grid_state)를 조합별 배열 그대로 .npz 파일로 저장합니다.
+    파일에는 상태 배열과 함께 몇 번째 봉까지 반영했는지(n_bars), 그 봉들의 지문이 들어갑니다.
+    max_files를 넘으면 가장 오래 쓰이지 않은 파일부터 지웁니다.
+    """
+
+    def __init__(self, directory, max_files=None):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key):
+        """
+        저장된 체크포인트를 읽습니다.
+
+        Returns:
+          tuple: (상태 dict, 반영한 봉 수, 봉 지문) — 없거나 읽을 수 없으면 None
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                state = {name[len("state_"):]: data[name] for name in data.files if name.startswith("state_")}
+                n_bars = int(data["n_bars"])
+                fingerprint = str(data["fingerprint"])
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        return state, n_bars, fingerprint
+
+    def save(self, key, state, n_bars, fingerprint):
+        """ 상태를 저장합니다. (임시 파일에 쓴 뒤 교체하므로 읽는 쪽은 항상 완전한 파일만 봅니다) """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, n_bars=np.int64(n_bars), fingerprint=np.array(fingerprint),
+                     **{f"state_{name}": value for name, value in state.items()})
+        os.replace(tmp_path, path)
+        if self.max_files is not None:
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    try:
+                        files.append((os.stat(os.path.join(self.directory, name)).st_mtime, name))
+                    except OSError:
+                        continue
+            for _, name in sorted(files)[:max(0, len(files) - self.max_files)]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
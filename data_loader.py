@@ -1,61 +1,240 @@
 # data_loader.py
 import datetime
+import json
+import os
+import threading
+import numpy as np
 import pandas as pd
 import streamlit as st
-from pykrx import stock
+import stock_api
+from search_index import TickerSearchIndex
+from single_flight import SingleFlight
+from config import DATA_CACHE_DIR
 
-@st.cache_data
+# 여러 세션이 같은 데이터를 동시에 요청하면 naver/KRX 요청은 한 번만 보내고 결과를 나눠 받습니다.
+_fetch_flight = SingleFlight()
+
+def get_fetch_stats():
+    """
+    데이터 요청 종류별 호출 수(calls), 실제로 받아온 수(fetches), 동시 요청을 합쳐서 아낀 수(shared)를 반환합니다.
+    (프로세스 시작 이후 누적)
+    """
+    return _fetch_flight.stats()
+
+def _load_daily_json(name, fetch):
+    """
+    fetch() 결과를 DATA_CACHE_DIR/tickers/<name>.json에 저장해 두고, 같은 날에는 파일에서 읽습니다.
+    날짜가 바뀌면 새로 받아오며, 받아오다 실패하면 이전에 저장한 값을 그대로 사용합니다.
+    """
+    today = datetime.date.today().strftime("%Y%m%d")
+    path = os.path.join(DATA_CACHE_DIR, "tickers", f"{name}.json")
+    saved = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["date"] == today:
+            return saved["items"]
+    except (OSError, ValueError, KeyError, TypeError):
+        saved = None
+
+    try:
+        items = _fetch_flight.do(("ticker_info", name), fetch)
+    except Exception:
+        if saved is None:
+            raise
+        return saved["items"]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"date": today, "items": items}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return items
+
+@st.cache_data(ttl=3600)
 def load_ticker_info():
-    """ KOSPI, KOSDAQ 전체 티커와 이름 정보를 가져옵니다. """
-    tickers_kospi = stock.get_market_ticker_list(market="KOSPI")
-    tickers_kosdaq = stock.get_market_ticker_list(market="KOSDAQ")
-    ticker_dict = {}
-    for t in tickers_kospi:
-        try:
-            ticker_dict[t] = stock.get_market_ticker_name(t)
-        except Exception:
-            ticker_dict[t] = "Unknown"
-    for t in tickers_kosdaq:
-        try:
-            ticker_dict[t] = stock.get_market_ticker_name(t)
-        except Exception:
-            ticker_dict[t] = "Unknown"
-    return ticker_dict
-
-@st.cache_data
+    """ KOSPI, KOSDAQ 전체 티커와 이름 정보를 가져옵니다. (시장별 일괄 조회, 하루 한 번 갱신) """
+    def fetch():
+        date = stock_api.get_nearest_business_day_in_a_week()
+        ticker_dict = stock_api.get_market_ticker_and_name(date, market="KOSPI")
+        ticker_dict.update(stock_api.get_market_ticker_and_name(date, market="KOSDAQ"))
+        return ticker_dict
+    return _load_daily_json("stock_ticker_info", fetch)
+
+@st.cache_data(ttl=3600)
 def load_etf_ticker_info():
-    """ ETF 전체 티커와 이름 정보를 가져옵니다. """
-    tickers = stock.get_etf_ticker_list()
-    ticker_dict = {}
-    for t in tickers:
-        try:
-            ticker_dict[t] = stock.get_etf_ticker_name(t)
-        except Exception:
-            ticker_dict[t] = "Unknown"
-    return ticker_dict
-
-@st.cache_data(show_spinner=False)
-def get_market_cap(ticker, date_str):
+    """ ETF 전체 티커와 이름 정보를 가져옵니다. (일괄 조회, 하루 한 번 갱신) """
+    return _load_daily_json("etf_ticker_info", stock_api.get_etf_ticker_and_name)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_ticker_search_index(instrument_type):
     """
-    지정한 날짜(date_str: 'YYYYMMDD') 기준으로 해당 종목의 시가총액을 반환합니다.
-    (ETF에는 적용되지 않습니다.)
+    종목(주식) 또는 ETF 전체 목록으로 검색 인덱스를 만듭니다.
+    목록 갱신 주기(1시간)마다 한 번만 만들고 모든 세션/재실행에서 같은 인덱스를 재사용합니다.
+    """
+    ticker_info = load_ticker_info() if instrument_type == "주식" else load_etf_ticker_info()
+    return TickerSearchIndex(ticker_info)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_market_cap_snapshot(date_str):
     """
+    지정한 날짜(date_str: 'YYYYMMDD')의 전종목 시가총액을 한 번에 가져와 티커별 Series로 반환합니다.
+    주말/휴일이면 직전 영업일 기준 값을 사용합니다. (ETF는 포함되지 않습니다.)
+    조회에 실패하거나 빈 응답이 오면 예외를 그대로 올립니다. (st.cache_data는 예외를 캐시하지 않으므로 다음 호출에서 다시 조회)
+    """
+    df_cap = _fetch_flight.do(
+        ("market_cap", date_str),
+        lambda: stock_api.get_market_cap_by_ticker(date_str, market="ALL", alternative=True)
+    )
+    if df_cap.empty:
+        raise ValueError(f"{date_str} 전종목 시가총액 응답이 비어 있습니다.")
+    return df_cap['시가총액']
+
+def _market_cap_snapshot_or_empty(date_str):
+    """ load_market_cap_snapshot을 부르고, 실패하면 빈 Series를 반환합니다. (실패 결과는 캐시되지 않음) """
     try:
-        df_cap = stock.get_market_cap_by_date(date_str, date_str, ticker)
-        if df_cap.empty:
-            return 0
-        return df_cap['시가총액'].iloc[0]
+        return load_market_cap_snapshot(date_str)
     except Exception:
-        return 0
+        return pd.Series(dtype='int64')
 
-def load_market_data(instrument_type, target_ticker, start_date, end_date):
+def get_market_cap(ticker, date_str):
     """
-    종목 또는 ETF의 OHLCV 데이터를 지정한 기간 동안 불러옵니다.
+    지정한 날짜(date_str: 'YYYYMMDD') 기준으로 해당 종목의 시가총액을 반환합니다.
+    (ETF에는 적용되지 않습니다. 시가총액을 받지 못하면 0)
+    """
+    return int(_market_cap_snapshot_or_empty(date_str).get(ticker, 0))
+
+def sort_tickers_by_market_cap(tickers, date_str):
+    """
+    {티커: 이름} 딕셔너리를 시가총액 내림차순 (티커, 이름) 리스트로 정렬합니다.
+    시가총액은 하루 한 번 받은 전종목 스냅샷에서 한 번에 조회하며, 같은 값은 원래 순서를 유지합니다.
+    (시가총액을 받지 못하면 원래 순서 그대로)
     """
+    codes = list(tickers)
+    caps = _market_cap_snapshot_or_empty(date_str).reindex(codes, fill_value=0).to_numpy()
+    order = np.argsort(-caps, kind='stable')
+    return [(codes[i], tickers[codes[i]]) for i in order]
+
+def _fetch_market_data(instrument_type, target_ticker, fromdate, todate, adjusted):
+    """ naver/KRX에서 OHLCV를 그대로 받아옵니다. (KRX 조회는 stock_api가 긴 기간을 구간별로 나눠 동시에 받음) """
     if instrument_type == "주식":
-        df = stock.get_market_ohlcv_by_date(start_date, end_date, target_ticker)
+        df = stock_api.get_market_ohlcv_by_date(fromdate, todate, target_ticker, adjusted=adjusted)
     else:
-        df = stock.get_etf_ohlcv_by_date(start_date, end_date, target_ticker)
+        df = stock_api.get_etf_ohlcv_by_date(fromdate, todate, target_ticker)
     df.index = pd.to_datetime(df.index)
-    df.sort_index(inplace=True)
-    return df
+    df.index.name = '날짜'
+    return df.sort_index()
+
+def _ohlcv_cache_path(instrument_type, target_ticker, adjusted):
+    """ (투자 유형, 티커, 수정주가 여부)별 캐시 파일 경로를 반환합니다. """
+    kind = "stock" if instrument_type == "주식" else "etf"
+    return os.path.join(DATA_CACHE_DIR, "ohlcv", f"{kind}_{target_ticker}_{'adj' if adjusted else 'raw'}.npz")
+
+def _read_ohlcv_cache(instrument_type, target_ticker, adjusted):
+    """
+    캐시 배열과, 캐시가 보장하는 조회 구간과 컬럼 정보(meta)를 한 파일에서 함께 읽어 반환합니다.
+    캐시가 없거나 깨져 있으면 (None, None)을 반환합니다.
+    """
+    try:
+        with np.load(_ohlcv_cache_path(instrument_type, target_ticker, adjusted), allow_pickle=False) as cache:
+            records = cache["records"]
+            meta = {
+                "fromdate": str(cache["fromdate"]),
+                "todate": str(cache["todate"]),
+                "columns": cache["columns"].tolist(),
+            }
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return records, meta
+
+def _records_to_frame(records, columns):
+    """ 캐시 구조화 배열(의 일부)을 OHLCV DataFrame으로 복사해 옵니다. """
+    return pd.DataFrame(
+        {name: np.array(records[f"c{i}"]) for i, name in enumerate(columns)},
+        index=pd.DatetimeIndex(np.array(records["date"]), name='날짜')
+    )
+
+def _write_ohlcv_cache(instrument_type, target_ticker, adjusted, df, fromdate, todate):
+    """
+    OHLCV를 컬럼별 필드를 가진 구조화 배열로 만들어 조회 구간, 컬럼 이름과 함께 .npz 한 파일에 저장합니다.
+    임시 파일을 os.replace 한 번으로 바꿔 넣으므로, 같은 티커를 다른 구간으로 동시에 쓰더라도
+    읽는 쪽은 항상 한 쓰기의 데이터와 구간을 짝으로 봅니다.
+    """
+    path = _ohlcv_cache_path(instrument_type, target_ticker, adjusted)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    records = np.empty(len(df), dtype=[("date", "M8[ns]")] + [(f"c{i}", df[col].dtype) for i, col in enumerate(df.columns)])
+    records["date"] = df.index.values.astype("M8[ns]")
+    for i, col in enumerate(df.columns):
+        records[f"c{i}"] = df[col].to_numpy()
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f, records=records, fromdate=np.array(fromdate), todate=np.array(todate),
+            columns=np.array(list(df.columns), dtype=str)
+        )
+    os.replace(tmp_path, path)
+
+def _shift_date(date_str, days):
+    return (datetime.datetime.strptime(date_str, "%Y%m%d") + datetime.timedelta(days=days)).strftime("%Y%m%d")
+
+def _overlap_matches(cached, fetched):
+    """ 새로 받은 구간과 캐시가 겹치는 봉의 가격이 같은지 확인합니다. """
+    if fetched is None:
+        return True
+    common = fetched.index.intersection(cached.index)
+    columns = [col for col in ['시가', '고가', '저가', '종가'] if col in fetched.columns and col in cached.columns]
+    return np.array_equal(cached.loc[common, columns].to_numpy(), fetched.loc[common, columns].to_numpy())
+
+def load_market_data(instrument_type, target_ticker, start_date, end_date, adjusted=True):
+    """
+    종목 또는 ETF의 OHLCV 데이터를 지정한 기간 동안 불러옵니다.
+    이미 받아 둔 구간은 로컬 캐시에서 읽고, 캐시 구간 앞/뒤로 모자란 날짜만 naver/KRX에 요청해 병합합니다.
+    같은 조건의 요청이 동시에 들어오면 한 번만 불러와 나눠 받습니다.
+    (ETF는 수정주가 구분이 없으므로 adjusted를 무시합니다.)
+    """
+    if instrument_type != "주식":
+        adjusted = False
+    df = _fetch_flight.do(
+        ("market_data", instrument_type, target_ticker, start_date, end_date, adjusted),
+        lambda: _load_market_data(instrument_type, target_ticker, start_date, end_date, adjusted)
+    )
+    return df.copy()
+
+def _load_market_data(instrument_type, target_ticker, start_date, end_date, adjusted):
+    """ load_market_data의 실제 조회 (로컬 캐시 확인 후 모자란 구간만 요청) """
+
+    records, meta = _read_ohlcv_cache(instrument_type, target_ticker, adjusted)
+    if records is None:
+        df = _fetch_market_data(instrument_type, target_ticker, start_date, end_date, adjusted)
+        fromdate, todate = start_date, end_date
+    elif meta["fromdate"] <= start_date and end_date <= meta["todate"]:
+        # 캐시 적중: 요청 구간의 행만 꺼내고 네트워크 요청은 하지 않습니다.
+        lo = np.searchsorted(records["date"], pd.Timestamp(start_date).to_datetime64(), side="left")
+        hi = np.searchsorted(records["date"], pd.Timestamp(end_date).to_datetime64(), side="right")
+        return _records_to_frame(records[lo:hi], meta["columns"])
+    else:
+        cached = _records_to_frame(records, meta["columns"])
+        fromdate, todate = meta["fromdate"], meta["todate"]
+        head = tail = None
+        # 앞/뒤 구간은 캐시의 첫/마지막 봉과 겹치게 받아 수정주가가 바뀌었는지 확인합니다.
+        if start_date < fromdate:
+            overlap = cached.index[0].strftime("%Y%m%d") if len(cached) else fromdate
+            head = _fetch_market_data(instrument_type, target_ticker, start_date, overlap, adjusted)
+        if end_date > todate:
+            overlap = cached.index[-1].strftime("%Y%m%d") if len(cached) else todate
+            tail = _fetch_market_data(instrument_type, target_ticker, overlap, end_date, adjusted)
+        fromdate, todate = min(fromdate, start_date), max(todate, end_date)
+
+        if _overlap_matches(cached, head) and _overlap_matches(cached, tail):
+            df = pd.concat([part for part in (head, cached, tail) if part is not None])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+        else:
+            # 액면분할/배당 등으로 과거 수정주가가 달라졌으면 캐시를 버리고 전체 구간을 새로 받습니다.
+            df = _fetch_market_data(instrument_type, target_ticker, fromdate, todate, adjusted)
+
+    # 오늘 봉은 장중에 바뀔 수 있으므로 어제까지만 캐시에 남깁니다.
+    todate = min(todate, _shift_date(datetime.date.today().strftime("%Y%m%d"), -1))
+    if todate >= fromdate and len(df.columns):
+        _write_ohlcv_cache(instrument_type, target_ticker, adjusted, df.loc[:pd.Timestamp(todate)], fromdate, todate)
+    return df.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
@@ -1,38 +1,303 @@
 # database.py
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import httpx
+import pandas as pd
+import streamlit as st
 from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
-from datetime import datetime
+from config import (
+    SUPABASE_URL, SUPABASE_KEY, SUPABASE_HEALTHCHECK_INTERVAL, DATA_CACHE_DIR,
+    RESULT_WRITER_BATCH_SIZE, RESULT_WRITER_FLUSH_INTERVAL, RESULT_WRITER_MAX_RETRIES,
+    RECENT_SEARCHES_TTL, RECENT_SEARCHES_OVERFETCH
+)
+from logger import logger
+
+# 프로세스 전체에서 공유하는 Supabase 클라이언트 (내부 HTTP 연결 풀을 재사용)
+_client = None
+_client_checked_at = 0.0
+_client_lock = threading.Lock()
+_client_factory = create_client
+
+# 오래된 keep-alive 연결이 끊긴 경우처럼 요청이 서버에 닿지 않았을 때만 재연결 후 다시 시도합니다.
+_RECONNECT_ERRORS = (httpx.ConnectError, httpx.RemoteProtocolError)
+# RemoteProtocolError는 서버가 요청을 이미 받은 뒤에도 날 수 있으므로, insert는 연결 자체가 실패한 경우에만 다시 보냅니다.
+_INSERT_RECONNECT_ERRORS = (httpx.ConnectError,)
+
+def set_client_factory(factory):
+    """
+    클라이언트 생성 함수를 교체합니다. (예: 로컬 대역 서버용 클라이언트, 테스트 더블)
+    factory(url, key)는 Client와 같은 table(...) 인터페이스를 가진 객체를 반환해야 합니다.
+    """
+    global _client_factory
+    _client_factory = factory
+    reset_supabase_client()
+
+def reset_supabase_client():
+    """ 공유 클라이언트를 버리고 다음 호출 때 새로 만들도록 합니다. """
+    global _client
+    with _client_lock:
+        _client = None
+
+def _is_healthy(client) -> bool:
+    """ 가벼운 조회 한 번으로 연결 상태를 확인합니다. """
+    try:
+        client.table("backtest_results").select("run_timestamp").limit(1).execute()
+        return True
+    except Exception:
+        return False
 
 def get_supabase_client() -> Client:
     """
-    Supabase 클라이언트를 생성합니다.
+    프로세스 전체에서 공유하는 Supabase 클라이언트를 반환합니다.
+    SUPABASE_HEALTHCHECK_INTERVAL(초)이 지나면 연결 상태를 확인하고, 응답이 없으면 새로 연결합니다.
+    상태 확인 요청은 잠금 밖에서 보내므로 응답이 늦어도 다른 호출을 막지 않습니다.
+    """
+    global _client, _client_checked_at
+    with _client_lock:
+        now = time.monotonic()
+        if _client is None:
+            _client = _client_factory(SUPABASE_URL, SUPABASE_KEY)
+            _client_checked_at = now
+            return _client
+        client = _client
+        if now - _client_checked_at <= SUPABASE_HEALTHCHECK_INTERVAL:
+            return client
+        # 확인하는 동안 들어온 호출은 기존 클라이언트를 그대로 쓰도록 확인 시각을 먼저 갱신합니다.
+        _client_checked_at = now
+
+    if _is_healthy(client):
+        return client
+
+    with _client_lock:
+        # 확인하는 동안 다른 호출이 이미 바꿔 두었으면 그 클라이언트를 씁니다.
+        if _client is client or _client is None:
+            _client = _client_factory(SUPABASE_URL, SUPABASE_KEY)
+            _client_checked_at = time.monotonic()
+        return _client
+
+def _execute(build_query, reconnect_errors=_RECONNECT_ERRORS):
+    """
+    build_query(client)로 만든 쿼리를 실행합니다.
+    reconnect_errors 중 하나가 나면 클라이언트를 새로 만들어 한 번 더 시도합니다.
+    """
+    try:
+        return build_query(get_supabase_client()).execute()
+    except reconnect_errors:
+        reset_supabase_client()
+        return build_query(get_supabase_client()).execute()
+
+def insert_backtest_result(data):
+    """
+    백테스트 결과를 Supabase DB에 저장합니다. (dict 한 건 또는 dict 리스트를 한 번의 요청으로)
+    """
+    return _execute(lambda client: client.table("backtest_results").insert(data), _INSERT_RECONNECT_ERRORS)
+
+class BacktestResultWriter:
+    """
+    백테스트 결과 저장을 백그라운드 스레드로 넘기는 write-behind 큐입니다.
+    submit()은 바로 반환되고, 쌓인 행은 크기(batch_size) 또는 시간(flush_interval) 기준으로 묶어 여러 행을 한 번에 insert 합니다.
+    실패하면 지수 백오프로 재시도하고, 그래도 실패하면 로컬 저널 파일(jsonl)에 남겼다가 저장 스레드가 시작할 때와 다음 저장이 성공할 때 다시 보냅니다.
+    저널 쓰기/다시 쓰기는 한 잠금으로 묶어 종료 시 close()와 저장 스레드가 동시에 건드려도 행을 잃지 않습니다.
     """
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def insert_backtest_result(data: dict):
+    def __init__(self, journal_path, batch_size=RESULT_WRITER_BATCH_SIZE,
+                 flush_interval=RESULT_WRITER_FLUSH_INTERVAL, max_retries=RESULT_WRITER_MAX_RETRIES, backoff=0.5):
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        # 저장 스레드가 큐에서 꺼내 보내는 중인 묶음 (close()가 저널로 옮기면 None)
+        self._in_flight = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="backtest-result-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: dict):
+        """ 저장할 행을 큐에 넣고 바로 반환합니다. """
+        self._queue.put_nowait(row)
+
+    def flush(self, timeout=None) -> bool:
+        """ 큐에 들어온 행이 모두 처리(저장 또는 저널 기록)될 때까지 기다립니다. """
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def close(self, timeout=5.0):
+        """
+        종료 시 호출: 남은 행을 잠시 기다려 보내고, 끝내 못 보낸 행은 보내는 중이던 묶음까지 저널에 남깁니다.
+        보내는 중이던 묶음이 그 뒤에 저장되면 저장 스레드가 저널에서 그 묶음을 다시 지웁니다.
+        """
+        if self.flush(timeout):
+            return
+        with self._journal_lock:
+            self._closed = True
+            leftover = self._in_flight or []
+            self._in_flight = None
+            while True:
+                try:
+                    leftover.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                # 저널에 남긴 행도 처리한 것으로 셉니다.
+                self._queue.task_done()
+            self._append_journal(leftover)
+
+    def _run(self):
+        # 이전 실행이 남긴 저널부터 보냅니다.
+        try:
+            self._replay_journal()
+        except Exception as e:
+            logger.error(f"백테스트 결과 저널 재전송 오류: {e}")
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._journal_lock:
+                self._in_flight = list(batch)
+            try:
+                sent = self._insert_with_retry(batch)
+                with self._journal_lock:
+                    # close()가 이미 저널로 옮긴 묶음은 다시 기록하지 않습니다.
+                    journaled = self._in_flight is None
+                    self._in_flight = None
+                    if not sent and not journaled:
+                        self._append_journal(batch)
+                    elif sent and journaled:
+                        self._discard_journaled(batch)
+                if sent and not self._closed:
+                    self._replay_journal()
+            except Exception as e:
+                logger.error(f"백테스트 결과 저장 스레드 오류: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _insert_with_retry(self, rows) -> bool:
+        for attempt in range(self.max_retries):
+            if self._closed:
+                # close()가 이 묶음을 저널로 옮겼으므로 더 보내지 않습니다. (다음 실행에서 저널로 다시 보냄)
+                return False
+            try:
+                insert_backtest_result(rows)
+                return True
+            except Exception as e:
+                logger.warning(f"백테스트 결과 저장 실패 ({attempt + 1}/{self.max_retries}): {e}")
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return False
+
+    def _append_journal(self, rows):
+        """ 행을 저널 끝에 덧붙입니다. (self._journal_lock을 잡은 상태에서 호출) """
+        if not rows:
+            return
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=float) + "\n")
+        logger.warning(f"백테스트 결과 {len(rows)}건을 저널에 보관했습니다: {self.journal_path}")
+
+    def _read_journal(self):
+        """ 저널의 행을 읽습니다. (self._journal_lock을 잡은 상태에서 호출) """
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _discard_journaled(self, rows):
+        """
+        close()가 저널로 옮긴 뒤 결국 저장된 묶음을 저널에서 지웁니다. (self._journal_lock을 잡은 상태에서 호출)
+        close()는 이 묶음을 한꺼번에 덧붙이므로, 저널 끝에서부터 같은 행이 연속으로 나오는 자리를 찾아 지웁니다.
+        """
+        # 저널과 같은 모양으로 비교하도록 JSON으로 한 번 바꿔 읽습니다.
+        rows = [json.loads(json.dumps(row, ensure_ascii=False, default=float)) for row in rows]
+        journal = self._read_journal()
+        for start in range(len(journal) - len(rows), -1, -1):
+            if journal[start:start + len(rows)] == rows:
+                self._write_journal(journal[:start] + journal[start + len(rows):])
+                return
+
+    def _write_journal(self, rows):
+        """ 저널을 rows로 바꿉니다. 남은 행이 없으면 파일을 지웁니다. (self._journal_lock을 잡은 상태에서 호출) """
+        if not rows:
+            os.remove(self.journal_path)
+            return
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.journal_path)
+
+    def _replay_journal(self):
+        """
+        저널에 남은 행을 batch_size씩 다시 보내고, 보내지 못한 나머지만 저널에 남깁니다.
+        보내는 동안에는 잠금을 풀어 두고, 그 사이 덧붙은 행은 다시 쓸 때 그대로 남깁니다. (저널은 끝에만 덧붙음)
+        """
+        with self._journal_lock:
+            rows = self._read_journal()
+        if not rows:
+            return
+        sent = 0
+        for start in range(0, len(rows), self.batch_size):
+            try:
+                insert_backtest_result(rows[start:start + self.batch_size])
+            except Exception:
+                break
+            sent = min(start + self.batch_size, len(rows))
+        if not sent:
+            return
+
+        with self._journal_lock:
+            self._write_journal(self._read_journal()[sent:])
+
+_result_writer = None
+_result_writer_lock = threading.Lock()
+
+def get_result_writer() -> BacktestResultWriter:
+    """ 프로세스 전체에서 공유하는 결과 저장 큐를 반환합니다. """
+    global _result_writer
+    with _result_writer_lock:
+        if _result_writer is None:
+            _result_writer = BacktestResultWriter(os.path.join(DATA_CACHE_DIR, "backtest_results_journal.jsonl"))
+            atexit.register(_result_writer.close)
+        return _result_writer
+
+def submit_backtest_result(data: dict):
     """
-    백테스트 결과를 Supabase DB에 저장합니다.
+    백테스트 결과를 백그라운드에서 저장하도록 넘기고 바로 반환합니다.
+    Supabase 지연이나 장애가 백테스트 응답을 늦추거나 실패시키지 않습니다.
     """
-    client = get_supabase_client()
-    result = client.table("backtest_results").insert(data).execute()
-    return result
+    get_result_writer().submit(data)
 
+@st.cache_data(ttl=RECENT_SEARCHES_TTL, show_spinner=False)
 def fetch_recent_searches(limit=20):
-    client = get_supabase_client()
-    response = client.table("backtest_results") \
-        .select("run_timestamp, target_ticker, ticker_name, start_date, end_date, max_return") \
-        .order("run_timestamp", desc=True) \
-        .limit(limit) \
-        .execute()
-    
-    # 데이터 포매팅: run_timestamp를 '년-월-일 시:분' 형태로 변환
-    formatted_data = []
-    for item in response.data:
-        # run_timestamp를 datetime 객체로 변환하고 '년-월-일 시:분' 형태로 포맷팅합니다.
-        original_timestamp = item['run_timestamp']
-        formatted_timestamp = datetime.fromisoformat(original_timestamp).strftime('%Y-%m-%d %H:%M')
-        # 포맷팅된 timestamp를 아이템에 반영하고 새로운 아이템을 리스트에 추가합니다.
-        item['run_timestamp'] = formatted_timestamp
-        formatted_data.append(item)
-
-    return formatted_data
\ No newline at end of file
+    """
+    최근 검색 내역을 (종목, 기간) 기준으로 중복 없이 최신순 limit건 반환합니다.
+    결과는 모든 세션이 RECENT_SEARCHES_TTL초 동안 공유하므로, 그 사이에는 DB 요청이 한 번뿐입니다.
+    PostgREST에는 DISTINCT가 없으므로 limit의 RECENT_SEARCHES_OVERFETCH배를 한 번에 받아 중복을 걸러냅니다.
+    """
+    columns = ["run_timestamp", "target_ticker", "ticker_name", "start_date", "end_date", "max_return"]
+    response = _execute(
+        lambda client: client.table("backtest_results")
+        .select(", ".join(columns))
+        .order("run_timestamp", desc=True)
+        .limit(limit * RECENT_SEARCHES_OVERFETCH)
+    )
+    df = pd.DataFrame(response.data, columns=columns)
+    df = df.drop_duplicates(subset=["target_ticker", "start_date", "end_date"]).head(limit).reset_index(drop=True)
+    # run_timestamp를 '년-월-일 시:분' 형태로 한 번에 변환
+    df["run_timestamp"] = pd.to_datetime(df["run_timestamp"], format="ISO8601", utc=True).dt.strftime('%Y-%m-%d %H:%M')
+    return df
@@ -0,0 +1,121 @@
+# intraday.py
+# 분봉/시간봉 데이터 (로컬 CSV/Parquet 분봉을 조각 단위로 읽고 리샘플링해 스트리밍 백테스트)
+import os
+
+import pandas as pd
+
+from config import INTRADAY_CHUNK_ROWS
+from stock_api import resample_ohlcv
+from strategy import StreamingBacktest
+
+# 봉 구간별 집계 방법 (stock_api의 OHLCV 리샘플링과 동일)
+OHLCV_AGG = {'시가': 'first', '고가': 'max', '저가': 'min', '종가': 'last', '거래량': 'sum'}
+
+# 분봉 파일에서 인식하는 컬럼 이름 (소문자 기준)
+_COLUMN_ALIASES = {
+    'open': '시가', 'high': '고가', 'low': '저가', 'close': '종가', 'volume': '거래량',
+    '시가': '시가', '고가': '고가', '저가': '저가', '종가': '종가', '거래량': '거래량',
+}
+_DATETIME_ALIASES = ('datetime', 'timestamp', 'date', 'time', '일시', '날짜', '시간')
+
+
+def _normalize_bars(chunk):
+    """ 분봉 조각의 컬럼 이름을 시가/고가/저가/종가/거래량으로 맞추고 시각을 인덱스로 둡니다. """
+    columns = {col: _COLUMN_ALIASES[str(col).strip().lower()] for col in chunk.columns
+               if str(col).strip().lower() in _COLUMN_ALIASES}
+    datetime_col = next((col for col in chunk.columns if str(col).strip().lower() in _DATETIME_ALIASES), None)
+    if datetime_col is None and not isinstance(chunk.index, pd.DatetimeIndex):
+        raise ValueError(f"분봉 데이터에서 시각 컬럼을 찾을 수 없습니다. ({', '.join(_DATETIME_ALIASES)} 중 하나 필요)")
+    missing = {'고가', '저가', '종가'} - set(columns.values())
+    if missing:
+        raise ValueError(f"분봉 데이터에 {', '.join(sorted(missing))} 컬럼이 없습니다.")
+
+    bars = chunk.rename(columns=columns)[list(columns.values())]
+    if datetime_col is not None:
+        bars.index = pd.DatetimeIndex(pd.to_datetime(chunk[datetime_col]), name='일시')
+    return bars.dropna(subset=['종가'])
+
+
+def read_minute_bars(path, chunk_rows=INTRADAY_CHUNK_ROWS):
+    """
+    로컬 CSV/Parquet 분봉 파일을 chunk_rows 행씩 읽어 DataFrame 조각으로 돌려줍니다. (시간 순으로 정렬된 파일 기준)
+    Parquet 파일은 pyarrow가 설치되어 있어야 합니다.
+
+    Parameters:
+      path (str): .csv 또는 .parquet 파일 경로
+      chunk_rows (int): 한 번에 읽을 행 수
+
+    Returns:
+      generator: 인덱스가 시각이고 컬럼이 시가/고가/저가/종가(/거래량)인 DataFrame 조각
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet 분봉 파일을 읽으려면 pyarrow가 필요합니다. (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield _normalize_bars(batch.to_pandas())
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield _normalize_bars(chunk)
+
+
+def _aggregate(bars, offset):
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in bars.columns}
+    return resample_ohlcv(bars, offset.freqstr, agg)
+
+
+def resample_bars(chunks, freq):
+    """
+    시간 순서대로 들어오는 분봉 조각을 freq 간격의 봉으로 이어서 리샘플링합니다.
+    조각마다 stock_api.resample_ohlcv로 집계하고, 조각 끝에 걸친 마지막 구간은 다음 조각과 합쳐서 집계하므로
+    파일 전체를 resample_ohlcv(df, freq, ...)로 한 번에 리샘플링한 결과와 같습니다.
+    구간은 둘 다 1970-01-01 00:00 기준으로 나누므로 하루를 나누어떨어지지 않는 주기('50min', '7min' 등)도 같은 경계가 되고,
+    거래가 없는 구간(장 마감 이후 등)은 만들지 않습니다.
+
+    Parameters:
+      chunks (iterable): read_minute_bars가 돌려주는 DataFrame 조각
+      freq (str): 고정 길이 pandas 주기 문자열 (예: '5min', '60min', '1h')
+
+    Returns:
+      generator: 리샘플링된 DataFrame 조각
+    """
+    try:
+        offset = pd.tseries.frequencies.to_offset(freq)
+        pd.Timedelta(offset)
+    except ValueError as e:
+        raise ValueError(f"분봉 리샘플링 주기는 '5min', '60min'처럼 고정 길이여야 합니다: {freq}") from e
+
+    carry = None
+    for chunk in chunks:
+        if carry is not None and len(carry):
+            chunk = pd.concat([carry, chunk])
+        if chunk.empty:
+            continue
+        labels = chunk.index.floor(offset)
+        # 마지막 구간은 다음 조각에 이어질 수 있으므로 남겨 둡니다.
+        done = labels < labels[-1]
+        if done.any():
+            yield _aggregate(chunk[done], offset)
+        carry = chunk[~done]
+    if carry is not None and len(carry):
+        yield _aggregate(carry, offset)
+
+
+def run_intraday_backtest(path, freq, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+                          chunk_rows=INTRADAY_CHUNK_ROWS, record_trades=True):
+    """
+    분봉 파일을 freq 간격 봉으로 리샘플링하면서 조각 단위로 백테스트합니다.
+    메모리에는 한 조각과 백테스트 상태만 올라가므로 1년치 1분봉도 한 번에 읽지 않고 처리합니다.
+
+    Returns:
+      trade_history (TradeLog), final_value, total_return (%) — run_backtest와 같은 형식 (봉 번호는 리샘플링된 봉 기준)
+    """
+    backtest = StreamingBacktest(
+        initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+        record_trades=record_trades, skip_idle_bars=True
+    )
+    for bars in resample_bars(read_minute_bars(path, chunk_rows), freq):
+        backtest.feed(bars)
+    return backtest.result()
@@ -0,0 +1,395 @@
+# optimizer.py
+# 파라미터 그리드 최적화 실행기 (멀티 프로세스 병렬 실행, 적응형 정밀 탐색)
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import GridCheckpointStore, checkpoint_key, prefix_fingerprint
+from config import (
+    PARALLEL_GRID_MIN_CELLS, PARALLEL_MAX_WORKERS,
+    GRID_CACHE_MAX_BYTES, GRID_CACHE_DISK_DIR, GRID_CACHE_DISK_MAX_BYTES,
+    GRID_CHECKPOINT_DIR, GRID_CHECKPOINT_MAX_FILES, ADAPTIVE_FINE_STEP, ADAPTIVE_TOP_K
+)
+from result_cache import GridResultCache, grid_cache_key
+from strategy import (
+    backtest_grid_arrays, best_cell_events, price_arrays, expand_grid, returns_frame, run_backtest_grid,
+    run_backtest_event_driven, compute_portfolio_history, new_grid_state, grid_total_return
+)
+from trade_log import EVENT_DTYPE, TradeLog
+
+# 워커 프로세스마다 한 번만 붙는 공유 메모리 가격 배열 (고가, 저가, 종가)
+_worker_shm = None
+_worker_prices = None
+
+def _init_worker(shm_name, n_bars):
+    """ 워커 초기화: OHLC 배열을 복사 없이 공유 메모리에서 바로 참조합니다. """
+    global _worker_shm, _worker_prices
+    # 풀 워커는 부모와 같은 resource_tracker를 쓰므로 블록 해제는 부모의 unlink 한 번으로 끝납니다.
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_prices = np.ndarray((3, n_bars), dtype=np.float64, buffer=_worker_shm.buf)
+
+def _run_chunk(initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent, record_best=False, state=None):
+    """
+    워커에서 조합 묶음 하나를 배치 커널로 실행합니다.
+    반환값:
+      - 총 수익률 배열
+      - record_best=True이면 묶음 안 최고 수익 조합의 이벤트 (조합 번호는 묶음 안 번호), 아니면 None
+      - state를 주면 갱신된 묶음 상태, 아니면 None
+    """
+    high, low, close = _worker_prices
+    best_events = None
+    if record_best:
+        total_return, events = backtest_grid_arrays(
+            high, low, close, initial_investment, unit_investment, max_buy_times,
+            buy_next_percent, sell_percent, record_events=True, state=state
+        )
+        _, best_events = best_cell_events(total_return, events)
+    else:
+        total_return = backtest_grid_arrays(
+            high, low, close, initial_investment, unit_investment, max_buy_times,
+            buy_next_percent, sell_percent, state=state
+        )
+    return total_return, best_events, state
+
+def run_backtest_grid_parallel(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+                               max_workers=None, chunk_size=None, progress_callback=None, record_best=False, state=None):
+    """
+    파라미터 조합을 여러 묶음으로 나누어 ProcessPoolExecutor에서 병렬로 백테스트합니다.
+    OHLC 배열은 공유 메모리에 한 번만 올리고, 작업마다 DataFrame을 피클링하지 않습니다.
+    결과는 끝난 순서와 상관없이 조합 순서대로 모으므로 run_backtest_grid와 같은 행렬을 반환합니다.
+
+    Parameters:
+      df (DataFrame): 날짜별 OHLCV 데이터
+      buy_grid (array-like): 매수 갭 % 후보값
+      sell_grid (array-like): 매도 % 후보값
+      max_workers (int, optional): 프로세스 수 (기본값: CPU 수)
+      chunk_size (int, optional): 작업 하나에 들어가는 조합 수
+      progress_callback (callable, optional): 진행률(0~1)을 받는 함수, 묶음이 끝날 때마다 호출
+      record_best (bool): True이면 최고 수익 조합의 이벤트 배열도 함께 반환
+      state (dict, optional): new_grid_state 상태 (주면 묶음별로 나누어 이어서 실행하고 결과를 제자리 반영)
+
+    Returns:
+      DataFrame: 총 수익률 (%) 행렬 (인덱스 '매수 갭 %', 컬럼 '매도 %')
+      (record_best=True이면 (행렬, 최고 수익 조합의 이벤트 배열))
+    """
+    high, low, close = price_arrays(df)
+    buy_next_percent, sell_percent = expand_grid(buy_grid, sell_grid)
+    n_cells = len(buy_next_percent)
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # 진행률이 자주 갱신되도록 워커당 4묶음 정도로 나눕니다.
+        chunk_size = max(1, math.ceil(n_cells / (max_workers * 4)))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(3 * len(close) * 8, 1))
+    try:
+        np.ndarray((3, len(close)), dtype=np.float64, buffer=shm.buf)[:] = (high, low, close)
+
+        total_return = np.empty(n_cells)
+        chunk_best_events = {}
+        done = 0
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shm.name, len(close))) as executor:
+            futures = {}
+            for start in range(0, n_cells, chunk_size):
+                stop = min(start + chunk_size, n_cells)
+                chunk_state = None if state is None else {name: value[start:stop] for name, value in state.items()}
+                future = executor.submit(
+                    _run_chunk, initial_investment, unit_investment, max_buy_times,
+                    buy_next_percent[start:stop], sell_percent[start:stop], record_best, chunk_state
+                )
+                futures[future] = (start, stop)
+
+            for future in as_completed(futures):
+                start, stop = futures[future]
+                total_return[start:stop], chunk_best_events[start], chunk_state = future.result()
+                if state is not None:
+                    for name, value in chunk_state.items():
+                        state[name][start:stop] = value
+                done += stop - start
+                if progress_callback is not None:
+                    progress_callback(done / n_cells)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    returns = returns_frame(total_return, buy_grid, sell_grid)
+    if not record_best:
+        return returns
+
+    # 전체 최고 조합은 자기 묶음에서도 (앞 조합 우선으로) 최고이므로 그 묶음의 기록을 그대로 씁니다.
+    best = int(np.argmax(total_return))
+    start = best - best % chunk_size
+    best_events = chunk_best_events[start].copy()
+    best_events['cell'] += start
+    return returns, best_events
+
+_grid_result_cache = None
+_grid_checkpoint_store = None
+_grid_result_cache_lock = threading.Lock()
+
+def get_grid_result_cache():
+    """ 프로세스 전체에서 공유하는 그리드 결과 캐시를 반환합니다. """
+    global _grid_result_cache
+    with _grid_result_cache_lock:
+        if _grid_result_cache is None:
+            _grid_result_cache = GridResultCache(GRID_CACHE_MAX_BYTES, GRID_CACHE_DISK_DIR, GRID_CACHE_DISK_MAX_BYTES)
+        return _grid_result_cache
+
+def get_grid_checkpoint_store():
+    """ 프로세스 전체에서 공유하는 그리드 상태 체크포인트 저장소를 반환합니다. """
+    global _grid_checkpoint_store
+    with _grid_result_cache_lock:
+        if _grid_checkpoint_store is None:
+            _grid_checkpoint_store = GridCheckpointStore(GRID_CHECKPOINT_DIR, GRID_CHECKPOINT_MAX_FILES)
+        return _grid_checkpoint_store
+
+def _run_grid_segment(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid, state, progress_callback=None,
+                      record_best=False):
+    """
+    df의 봉을 state에 이어서 실행합니다. (조합 수가 많으면 멀티 프로세스)
+    record_best=True이면 이 구간 끝의 최고 수익 조합이 이 구간에서 낸 이벤트 배열을 반환합니다. (봉 번호는 df 기준)
+    """
+    if len(buy_grid) * len(sell_grid) >= PARALLEL_GRID_MIN_CELLS:
+        result = run_backtest_grid_parallel(
+            df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+            max_workers=PARALLEL_MAX_WORKERS, progress_callback=progress_callback, record_best=record_best, state=state
+        )
+    else:
+        result = run_backtest_grid(
+            df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+            progress_callback=progress_callback, record_best=record_best, state=state
+        )
+    return result[1] if record_best else None
+
+def _resume_grid(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid, checkpoint_id, store,
+                 progress_callback=None):
+    """
+    저장된 체크포인트 이후의 봉만 실행해 조합별 총 수익률 행렬을 구합니다.
+    체크포인트는 확정된 (오늘 이전) 봉까지만 저장하고, 장중에 바뀔 수 있는 오늘 봉은 상태 사본에만 반영합니다.
+    저장된 봉 지문이 지금 데이터와 다르면 (수정주가 반영 등) 처음부터 다시 실행합니다.
+
+    Returns:
+      returns (DataFrame): 총 수익률 (%) 행렬
+      best_events (ndarray or None): 처음부터 실행했으면 최고 수익 조합의 전체 이벤트 배열 (봉 번호는 df 기준),
+                                     체크포인트에서 이어서 실행했거나 구간별 기록을 이어 붙일 수 없으면 None
+    """
+    key = checkpoint_key(checkpoint_id, df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid)
+    n_complete = int(np.searchsorted(df.index.values, np.datetime64(pd.Timestamp.today().normalize()), side='left'))
+    close = df['종가'].to_numpy(dtype=np.float64)
+
+    state, start = None, 0
+    checkpoint = store.load(key)
+    if checkpoint is not None:
+        saved_state, saved_bars, fingerprint = checkpoint
+        if saved_bars <= n_complete and fingerprint == prefix_fingerprint(df, saved_bars):
+            state, start = saved_state, saved_bars
+    if state is None:
+        state = new_grid_state(len(buy_grid) * len(sell_grid), initial_investment, max_buy_times)
+
+    # 처음부터 실행하면 체크포인트 없는 실행처럼 최고 조합의 이벤트를 함께 기록해 다시 백테스트하지 않습니다.
+    record_best = start == 0
+    segments = []      # [(구간 시작 봉, 구간 끝 최고 조합, 이벤트)]
+    if n_complete > start:
+        events = _run_grid_segment(df.iloc[start:n_complete], initial_investment, unit_investment, max_buy_times,
+                                   buy_grid, sell_grid, state, progress_callback, record_best)
+        store.save(key, state, n_complete, prefix_fingerprint(df, n_complete))
+        if record_best:
+            best = int(np.argmax(grid_total_return(state, close[n_complete - 1], initial_investment)))
+            segments.append((start, best, events))
+    if len(df) > n_complete:
+        state = {name: value.copy() for name, value in state.items()}
+        events = _run_grid_segment(df.iloc[n_complete:], initial_investment, unit_investment, max_buy_times,
+                                   buy_grid, sell_grid, state, record_best=record_best)
+        if record_best:
+            best = int(np.argmax(grid_total_return(state, close[-1], initial_investment)))
+            segments.append((n_complete, best, events))
+    if progress_callback is not None:
+        progress_callback(1.0)
+
+    total_return = grid_total_return(state, close[-1], initial_investment)
+    best_events = None
+    best = int(np.argmax(total_return))
+    # 구간마다 그 구간 끝의 최고 조합만 기록하므로, 모든 구간의 최고 조합이 최종 최고 조합과 같을 때만 이어 붙입니다.
+    if record_best and all(segment_best == best for _, segment_best, _ in segments):
+        parts = []
+        for offset, _, events in segments:
+            events = events.copy()
+            events['bar'] += offset
+            parts.append(events)
+        best_events = np.concatenate(parts) if parts else np.empty(0, dtype=EVENT_DTYPE)
+    return returns_frame(total_return, buy_grid, sell_grid), best_events
+
+def optimize_grid(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+                  progress_callback=None, cache=None, checkpoint_id=None, checkpoint_store=None):
+    """
+    그리드 전체를 백테스트해 최적 파라미터와 그 매매 내역을 구합니다.
+    조합 수가 PARALLEL_GRID_MIN_CELLS 이상이면 멀티 프로세스로 실행합니다.
+    cache(GridResultCache)를 주면 같은 데이터/설정/그리드의 결과를 계산 없이 돌려줍니다.
+    checkpoint_id(종목 식별자)와 checkpoint_store(GridCheckpointStore)를 주면 조합별 상태를 저장해 두고,
+    같은 시작일로 다시 실행할 때 새로 추가된 봉만 이어서 계산합니다.
+
+    Returns:
+      dict: returns(총 수익률 행렬), max_return, optimal_buy_next_percent, optimal_sell_percent,
+            trade_history(TradeLog), final_value, portfolio_dates, portfolio_values
+    """
+    key = None
+    if cache is not None:
+        key = grid_cache_key(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid)
+        result = cache.get(key)
+        if result is not None:
+            if progress_callback is not None:
+                progress_callback(1.0)
+            return result
+
+    if checkpoint_id is not None and checkpoint_store is not None:
+        returns, best_events = _resume_grid(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+                                            checkpoint_id, checkpoint_store, progress_callback)
+        optimal_i, optimal_j = np.unravel_index(np.argmax(returns.values), returns.shape)
+        optimal_buy_next_percent = returns.index[optimal_i]
+        optimal_sell_percent = returns.columns[optimal_j]
+        if best_events is not None:
+            trade_history = TradeLog.from_events(df.index, best_events)
+        else:
+            # 이어서 실행한 구간의 이벤트만으로는 전체 매매 내역이 없으므로 최적 조합 하나만 건너뛰기 엔진으로 다시 실행합니다.
+            trade_history, _, _ = run_backtest_event_driven(
+                df, initial_investment, unit_investment, max_buy_times, optimal_buy_next_percent, optimal_sell_percent
+            )
+        result = _optimum_result(df, initial_investment, returns, returns.values.max(),
+                                 optimal_buy_next_percent, optimal_sell_percent, trade_history)
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+    # 그리드를 도는 동안 최고 조합의 매매 이벤트까지 기록해 두므로 최적 조합을 다시 백테스트하지 않습니다.
+    if len(buy_grid) * len(sell_grid) >= PARALLEL_GRID_MIN_CELLS:
+        returns, best_events = run_backtest_grid_parallel(
+            df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+            max_workers=PARALLEL_MAX_WORKERS, progress_callback=progress_callback, record_best=True
+        )
+    else:
+        returns, best_events = run_backtest_grid(
+            df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid,
+            progress_callback=progress_callback, record_best=True
+        )
+
+    # 최적 파라미터 도출 (동률이면 매수 갭 → 매도 % 순으로 먼저 나온 조합)
+    optimal_i, optimal_j = np.unravel_index(np.argmax(returns.values), returns.shape)
+    optimal_buy_next_percent = returns.index[optimal_i]
+    optimal_sell_percent = returns.columns[optimal_j]
+
+    result = _optimum_result(df, initial_investment, returns, returns.values.max(),
+                             optimal_buy_next_percent, optimal_sell_percent, TradeLog.from_events(df.index, best_events))
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+def _optimum_result(df, initial_investment, returns, max_return, optimal_buy_next_percent, optimal_sell_percent, trade_history):
+    """ 최적 조합의 매매 내역으로 날짜별 포트폴리오 가치를 계산해 결과 dict로 묶습니다. """
+    portfolio_dates, portfolio_values = compute_portfolio_history(df, trade_history, initial_investment)
+    return {
+        'returns': returns,
+        'max_return': max_return,
+        'optimal_buy_next_percent': optimal_buy_next_percent,
+        'optimal_sell_percent': optimal_sell_percent,
+        'trade_history': trade_history,
+        'final_value': portfolio_values[-1],
+        'portfolio_dates': portfolio_dates,
+        'portfolio_values': portfolio_values,
+    }
+
+def _lattice(start, end, step):
+    """ start부터 end까지 step 간격의 값 (부동소수 누적 오차 없이 반올림) """
+    n = int(round((end - start) / step)) + 1
+    return np.round(start + step * np.arange(n), 10)
+
+def adaptive_grid_search(df, initial_investment, unit_investment, max_buy_times, buy_range, sell_range, coarse_steps,
+                         fine_step=ADAPTIVE_FINE_STEP, top_k=ADAPTIVE_TOP_K, progress_callback=None, verify=False):
+    """
+    거친 그리드를 먼저 평가한 뒤, 수익률 상위 top_k 조합 주변만 간격을 반씩 줄여 가며 fine_step 간격까지 좁혀 탐색합니다.
+    모든 조합은 fine_step 격자 위의 점이며, 한 번 평가한 조합은 다시 계산하지 않습니다.
+
+    Parameters:
+      buy_range (tuple): (매수 갭 % 시작, 끝)
+      sell_range (tuple): (매도 % 시작, 끝)
+      coarse_steps (tuple): 처음 평가할 (매수 갭 %, 매도 %) 간격
+      fine_step (float): 최종 탐색 간격 (%)
+      top_k (int): 단계마다 주변을 더 살펴볼 상위 조합 수
+      verify (bool): True이면 fine_step 전체 그리드도 실행해 결과를 비교 (검증용)
+
+    Returns:
+      dict: optimize_grid와 같은 항목 (returns는 거친 그리드의 수익률 행렬) 및
+            evaluations(평가한 조합 수), exhaustive_evaluations(전체 그리드 조합 수),
+            verify=True이면 exhaustive_max_return, exhaustive_optimum((매수 갭 %, 매도 %))
+    """
+    high, low, close = price_arrays(df)
+    buy_values = _lattice(buy_range[0], buy_range[1], fine_step)
+    sell_values = _lattice(sell_range[0], sell_range[1], fine_step)
+    n_buy, n_sell = len(buy_values), len(sell_values)
+    coarse_buy_stride = max(1, int(round(coarse_steps[0] / fine_step)))
+    coarse_sell_stride = max(1, int(round(coarse_steps[1] / fine_step)))
+
+    evaluated = {}     # (매수 갭 격자 번호, 매도 % 격자 번호) -> 총 수익률
+    best = None        # (-수익률, i, j): 작을수록 좋음 (동률이면 전체 그리드의 argmax와 같은 앞 조합)
+    best_events = None
+
+    def evaluate(cells):
+        nonlocal best, best_events
+        cells = sorted(cell for cell in cells if cell not in evaluated)
+        if not cells:
+            return
+        rows = np.array([i for i, _ in cells])
+        cols = np.array([j for _, j in cells])
+        total_return, events = backtest_grid_arrays(
+            high, low, close, initial_investment, unit_investment, max_buy_times,
+            buy_values[rows], sell_values[cols], record_events=True
+        )
+        evaluated.update(zip(cells, total_return.tolist()))
+        k, cell_events = best_cell_events(total_return, events)
+        candidate = (-total_return[k].item(), cells[k][0], cells[k][1])
+        if best is None or candidate < best:
+            best, best_events = candidate, cell_events
+
+    # 단계별 간격: 거친 간격에서 시작해 반씩 줄여 1(= fine_step)까지
+    strides = [(coarse_buy_stride, coarse_sell_stride)]
+    while strides[-1] != (1, 1):
+        strides.append(tuple((stride + 1) // 2 for stride in strides[-1]))
+
+    evaluate((i, j) for i in range(0, n_buy, coarse_buy_stride) for j in range(0, n_sell, coarse_sell_stride))
+    if progress_callback is not None:
+        progress_callback(1 / len(strides))
+    for level, (buy_stride, sell_stride) in enumerate(strides[1:], start=2):
+        top = sorted(evaluated, key=lambda cell: (-evaluated[cell], cell))[:top_k]
+        # 새 간격으로 ±2칸이면 이전 간격의 이웃 조합 사이 구간을 모두 덮습니다.
+        evaluate(
+            (i + di * buy_stride, j + dj * sell_stride)
+            for i, j in top for di in range(-2, 3) for dj in range(-2, 3)
+            if 0 <= i + di * buy_stride < n_buy and 0 <= j + dj * sell_stride < n_sell
+        )
+        if progress_callback is not None:
+            progress_callback(level / len(strides))
+
+    # 거친 그리드 부분은 모두 평가되어 있으므로 화면 표시용 행렬로 만듭니다.
+    coarse_rows = range(0, n_buy, coarse_buy_stride)
+    coarse_cols = range(0, n_sell, coarse_sell_stride)
+    returns = returns_frame(
+        [evaluated[(i, j)] for i in coarse_rows for j in coarse_cols],
+        buy_values[list(coarse_rows)], sell_values[list(coarse_cols)]
+    )
+
+    max_return, optimal_i, optimal_j = -best[0], best[1], best[2]
+    result = _optimum_result(df, initial_investment, returns, max_return,
+                             buy_values[optimal_i].item(), sell_values[optimal_j].item(),
+                             TradeLog.from_events(df.index, best_events))
+    result['evaluations'] = len(evaluated)
+    result['exhaustive_evaluations'] = n_buy * n_sell
+
+    if verify:
+        exhaustive = optimize_grid(df, initial_investment, unit_investment, max_buy_times, buy_values, sell_values)
+        result['exhaustive_max_return'] = exhaustive['max_return']
+        result['exhaustive_optimum'] = (exhaustive['optimal_buy_next_percent'], exhaustive['optimal_sell_percent'])
+    return result
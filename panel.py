@@ -0,0 +1,214 @@
+# panel.py
+# 전종목 일별 스냅샷으로 만드는 티커 × 날짜 패널 (하루 한 번 요청으로 시장 전체 OHLCV 수집)
+import datetime
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import stock_api
+from config import PANEL_DIR
+from logger import logger
+from range_fetcher import fetch_with_retry, get_krx_rate_limiter
+from trading_calendar import get_trading_calendar
+
+# 패널에 담는 필드 (get_market_ohlcv_by_ticker 컬럼)
+PANEL_FIELDS = ('시가', '고가', '저가', '종가', '거래량', '거래대금')
+
+
+class MarketPanel:
+    """
+    시장 전체 OHLCV를 필드마다 (티커 수, 날짜 수) 크기의 float64 배열 하나로 보관합니다.
+    배열은 행 우선(C) 순서라 한 종목의 시계열이 메모리에 이어져 있습니다.
+    상장 전/상장 폐지 후처럼 값이 없는 칸은 NaN이고, 거래정지일은 halted가 True이며 종가만 남고 시가/고가/저가는 NaN입니다.
+    재시도 끝에도 받지 못한 영업일은 dates에서 빠지고 missing에 남아, 다음 build_market_panel에서 다시 요청합니다.
+    """
+
+    def __init__(self, dates, tickers, fields, halted, missing=()):
+        self.dates = pd.DatetimeIndex(dates, name='날짜')
+        self.tickers = pd.Index(tickers, name='티커')
+        self.fields = {name: np.ascontiguousarray(values, dtype=np.float64) for name, values in fields.items()}
+        self.halted = np.ascontiguousarray(halted, dtype=np.bool_)
+        self.missing = pd.DatetimeIndex(missing, name='날짜').sort_values()
+
+    def __len__(self):
+        return len(self.dates)
+
+    def field(self, name):
+        """ 필드 하나를 티커 × 날짜 DataFrame으로 감쌉니다. (배열을 복사하지 않음) """
+        return pd.DataFrame(self.fields[name], index=self.tickers, columns=self.dates, copy=False)
+
+    def ohlcv(self, ticker, include_halted=False):
+        """
+        한 종목의 OHLCV를 load_market_data와 같은 형식(날짜 인덱스, 시가/고가/저가/종가/거래량)으로 꺼냅니다.
+
+        Parameters:
+          ticker (str): 티커
+          include_halted (bool): True이면 거래정지일도 시가/고가/저가를 종가로 채워 포함 (기본: 제외)
+
+        Returns:
+          DataFrame: 값이 있는 날짜만 담긴 OHLCV (패널에 없는 티커는 빈 DataFrame)
+        """
+        columns = [name for name in PANEL_FIELDS if name in self.fields]
+        i = self.tickers.get_indexer([ticker])[0]
+        if i < 0:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='날짜'), dtype=np.float64)
+
+        close = self.fields['종가'][i]
+        halted = self.halted[i]
+        keep = ~np.isnan(close) & (include_halted | ~halted)
+        df = pd.DataFrame({name: self.fields[name][i][keep] for name in columns}, index=self.dates[keep])
+        if include_halted:
+            for name in ('시가', '고가', '저가'):
+                df[name] = np.where(halted[keep], df['종가'], df[name])
+        return df
+
+    def save(self, path):
+        """ 패널을 .npz 파일로 저장합니다. (임시 파일에 쓴 뒤 교체) """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f, dates=self.dates.values.astype("M8[ns]"), tickers=self.tickers.to_numpy(dtype=str),
+                halted=self.halted, missing=self.missing.values.astype("M8[ns]"), field_names=np.array(list(self.fields)),
+                **{f"field_{i}": values for i, values in enumerate(self.fields.values())}
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """ save()로 저장한 패널을 읽습니다. 없거나 읽을 수 없으면 None을 반환합니다. """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                fields = {str(name): data[f"field_{i}"] for i, name in enumerate(data["field_names"])}
+                missing = data["missing"] if "missing" in data.files else ()
+                return cls(data["dates"], data["tickers"].tolist(), fields, data["halted"], missing)
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def _pivot(snapshots, missing=()):
+    """ {날짜: 전종목 스냅샷}을 날짜 순서의 MarketPanel로 바꿉니다. """
+    dates = sorted(snapshots)
+    tickers = pd.Index(sorted(set().union(*(df.index for df in snapshots.values()))))
+    fields = {name: np.full((len(tickers), len(dates)), np.nan) for name in PANEL_FIELDS}
+    halted = np.zeros((len(tickers), len(dates)), dtype=np.bool_)
+    for j, date in enumerate(dates):
+        df = snapshots[date]
+        rows = tickers.get_indexer(df.index)
+        for name in PANEL_FIELDS:
+            if name in df.columns:
+                fields[name][rows, j] = df[name].to_numpy(dtype=np.float64)
+        # 거래정지 종목은 종가만 있고 시가/고가/저가/거래량은 0으로 옵니다.
+        stopped = (df[['시가', '고가', '저가']] == 0).all(axis=1).to_numpy() & (df['종가'] > 0).to_numpy()
+        halted[rows, j] = stopped
+        for name in ('시가', '고가', '저가'):
+            fields[name][rows[stopped], j] = np.nan
+    return MarketPanel(pd.to_datetime(dates), tickers, fields, halted, missing)
+
+
+def _empty_panel(missing=()):
+    return MarketPanel(
+        pd.DatetimeIndex([]), [], {name: np.empty((0, 0)) for name in PANEL_FIELDS}, np.empty((0, 0), dtype=np.bool_),
+        missing
+    )
+
+
+def _select_dates(panel, mask, missing=None):
+    """ mask에 해당하는 날짜만 남긴 패널 (missing을 주지 않으면 원래 패널의 missing을 그대로 씀) """
+    return MarketPanel(
+        panel.dates[mask], panel.tickers, {name: values[:, mask] for name, values in panel.fields.items()},
+        panel.halted[:, mask], panel.missing if missing is None else missing
+    )
+
+
+def _merge(base, extra, missing=()):
+    """ 두 패널을 날짜 기준으로 합칩니다. (같은 날짜는 extra 값을 사용) """
+    dates = base.dates.union(extra.dates)
+    tickers = base.tickers.union(extra.tickers)
+    fields = {name: np.full((len(tickers), len(dates)), np.nan) for name in PANEL_FIELDS}
+    halted = np.zeros((len(tickers), len(dates)), dtype=np.bool_)
+    for panel in (base, extra):
+        rows = tickers.get_indexer(panel.tickers)[:, None]
+        cols = dates.get_indexer(panel.dates)[None, :]
+        for name in PANEL_FIELDS:
+            if name in panel.fields:
+                fields[name][rows, cols] = panel.fields[name]
+        halted[rows, cols] = panel.halted
+    return MarketPanel(dates, tickers, fields, halted, missing)
+
+
+def build_market_panel(fromdate, todate, market="ALL", base=None, progress_callback=None):
+    """
+    기간 안의 영업일(trading_calendar)마다 get_market_ohlcv_by_ticker로 시장 전체 스냅샷을 한 번씩 받아 티커 × 날짜 패널을 만듭니다.
+    종목 N개의 1년치를 모으는 데 종목별 기간 조회 N번 대신 약 250번의 요청이면 됩니다.
+    모든 종목의 가격이 0인 날(달력에 없는 휴장일)과 빈 응답은 건너뜁니다.
+    날짜별 요청은 KRX 요청 제한기를 거치고 실패하면 재시도하며(range_fetcher.fetch_with_retry),
+    그래도 실패한 날은 건너뛰고 반환 패널의 missing에 남깁니다. (나머지 날짜는 그대로 합침)
+
+    Parameters:
+      fromdate, todate (str): 조회 기간 (YYYYMMDD)
+      market (str): 조회 시장 (KOSPI/KOSDAQ/KONEX/ALL)
+      base (MarketPanel, optional): 이미 받아 둔 패널 — 이 패널의 첫 날짜~마지막 날짜 사이는 다시 받지 않고 합칩니다.
+                                    (base.missing 날짜는 다시 요청, 반환되는 패널은 base 전체와 요청 구간을 모두 포함)
+      progress_callback (callable, optional): (받은 날짜 수, 받을 날짜 수)를 받는 함수
+
+    Returns:
+      MarketPanel: missing에 받지 못한 날짜가 담긴 패널
+    """
+    start, end = pd.Timestamp(fromdate), pd.Timestamp(todate)
+    if base is not None and len(base):
+        # 저장된 구간과 요청 구간 사이가 비지 않도록 이어지는 날짜까지 함께 받습니다.
+        start, end = min(start, base.dates[0]), max(end, base.dates[-1])
+    days = pd.DatetimeIndex(get_trading_calendar().days(start, end))
+    if base is not None and len(base):
+        days = days[(days < base.dates[0]) | (days > base.dates[-1])].union(base.missing)
+
+    rate_limiter = get_krx_rate_limiter()
+    snapshots, failed = {}, []
+    for done, day in enumerate(days, start=1):
+        try:
+            df = fetch_with_retry(stock_api.get_market_ohlcv_by_ticker, day.strftime("%Y%m%d"), market,
+                                  rate_limiter=rate_limiter)
+        except Exception as e:
+            logger.error(f"{day:%Y%m%d} {market} 전종목 스냅샷 조회 실패, 이 날짜는 건너뜁니다: {e}")
+            failed.append(day)
+        else:
+            if len(df) and not (df[['시가', '고가', '저가', '종가']] == 0).all(axis=None):
+                snapshots[day] = df
+        if progress_callback is not None:
+            progress_callback(done, len(days))
+
+    panel = _pivot(snapshots, failed) if snapshots else None
+    if base is None or not len(base):
+        return panel if panel is not None else _empty_panel(failed)
+    if panel is None:
+        return _select_dates(base, np.ones(len(base), dtype=np.bool_), failed)
+    return _merge(base, panel, failed)
+
+
+def load_market_panel(fromdate, todate, market="ALL"):
+    """
+    PANEL_DIR/<market>.npz에 저장해 둔 패널을 읽고, 모자란 앞/뒤 날짜만 받아 합친 뒤 다시 저장합니다.
+    오늘 스냅샷은 장중에 바뀔 수 있으므로 어제까지만 저장합니다.
+    받지 못한 날짜가 있어도 나머지는 저장하고, 그 날짜는 missing으로 함께 저장해 다음 호출에서 다시 요청합니다.
+
+    Returns:
+      MarketPanel: 요청 기간의 날짜만 담긴 패널 (missing은 요청 기간 안에서 받지 못한 날짜)
+    """
+    path = os.path.join(PANEL_DIR, f"{market}.npz")
+    base = MarketPanel.load(path)
+    panel = build_market_panel(fromdate, todate, market, base=base)
+
+    today = pd.Timestamp(datetime.date.today())
+    stored = panel.dates < today
+    if stored.any() and (
+        base is None or not panel.dates[stored].isin(base.dates).all() or not panel.missing.equals(base.missing)
+    ):
+        _select_dates(panel, stored, panel.missing[panel.missing < today]).save(path)
+
+    start, end = pd.Timestamp(fromdate), pd.Timestamp(todate)
+    return _select_dates(
+        panel, (panel.dates >= start) & (panel.dates <= end), panel.missing[(panel.missing >= start) & (panel.missing <= end)]
+    )
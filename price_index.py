@@ -0,0 +1,41 @@
+# price_index.py
+# 봉별 최저/최고가 희소 테이블 (가격이 기준선을 처음 넘는 봉을 O(log n)에 찾기)
+import numpy as np
+
+
+class PriceCrossingIndex:
+    """
+    봉마다 저가/고가/종가 중 최솟값·최댓값을 구해 두고, 2의 거듭제곱 길이 구간의 최소/최대(희소 테이블)를 미리 계산합니다.
+    "start 봉부터 가격이 threshold 이하(이상)로 내려가는(올라가는) 첫 봉"을 구간을 반씩 줄여 가며 건너뛰어 찾으므로,
+    매매가 없는 긴 구간을 봉 단위로 확인하지 않아도 됩니다.
+    """
+
+    def __init__(self, high, low, close):
+        bar_min = np.minimum(np.minimum(low, high), close).astype(np.float64)
+        bar_max = np.maximum(np.maximum(low, high), close).astype(np.float64)
+        self.n_bars = len(bar_min)
+        # _mins[k][j] = min(bar_min[j : j + 2**k]), _maxs도 같은 방식
+        self._mins = [bar_min]
+        self._maxs = [bar_max]
+        length = 1
+        while length * 2 <= self.n_bars:
+            prev_min, prev_max = self._mins[-1], self._maxs[-1]
+            self._mins.append(np.minimum(prev_min[:-length], prev_min[length:]))
+            self._maxs.append(np.maximum(prev_max[:-length], prev_max[length:]))
+            length *= 2
+
+    def next_at_or_below(self, start, threshold):
+        """ start 봉부터 봐서 가격이 threshold 이하인 순간이 있는 첫 봉 번호 (없으면 n_bars) """
+        pos = start
+        for k in range(len(self._mins) - 1, -1, -1):
+            if pos + (1 << k) <= self.n_bars and self._mins[k][pos] > threshold:
+                pos += 1 << k
+        return pos
+
+    def next_at_or_above(self, start, threshold):
+        """ start 봉부터 봐서 가격이 threshold 이상인 순간이 있는 첫 봉 번호 (없으면 n_bars) """
+        pos = start
+        for k in range(len(self._maxs) - 1, -1, -1):
+            if pos + (1 << k) <= self.n_bars and self._maxs[k][pos] < threshold:
+                pos += 1 << k
+        return pos
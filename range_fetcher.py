@@ -0,0 +1,195 @@
+# range_fetcher.py
+# 긴 기간 조회를 구간별로 나눠 동시에 받아 오기 (토큰 버킷 요청 제한, 구간별 재시도)
+import asyncio
+import contextvars
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config import (
+    FETCH_CHUNK_DAYS, FETCH_MAX_WORKERS, FETCH_RATE_PER_SEC, FETCH_BURST,
+    FETCH_MAX_RETRIES, FETCH_RETRY_BACKOFF, NAVER_RATE_PER_SEC, NAVER_BURST
+)
+from logger import logger
+
+
+class TokenBucket:
+    """
+    초당 rate개씩 토큰이 차고 최대 capacity개까지 쌓이는 요청 제한기입니다.
+    acquire()는 토큰이 생길 때까지 기다렸다가 하나를 씁니다. (여러 스레드에서 공유)
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """ 토큰이 있으면 하나를 쓰고 0을, 없으면 기다려야 할 시간(초)을 반환합니다. """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """ acquire()의 asyncio 버전 (기다리는 동안 이벤트 루프를 막지 않음) """
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class DeferredRequests(BaseException):
+    """
+    stock_api_aio가 동기 조회 함수를 대신 실행할 때, 아직 받지 않은 HTTP 요청들을 알리는 신호입니다.
+    (조회 함수의 except Exception에 잡히지 않도록 BaseException을 상속)
+    """
+
+    def __init__(self, requests):
+        super().__init__()
+        self.requests = list(requests)
+
+
+# stock_api_aio가 요청을 모으는 중이면 True — 구간을 스레드 풀 대신 차례로 실행하고 모든 구간의 요청을 한 번에 올려 보냅니다.
+deferred_fetch = contextvars.ContextVar("deferred_fetch", default=False)
+
+
+_krx_rate_limiter = None
+_krx_rate_limiter_lock = threading.Lock()
+
+
+def get_krx_rate_limiter():
+    """ 프로세스 전체에서 공유하는 KRX 요청 제한기를 반환합니다. """
+    global _krx_rate_limiter
+    with _krx_rate_limiter_lock:
+        if _krx_rate_limiter is None:
+            _krx_rate_limiter = TokenBucket(FETCH_RATE_PER_SEC, FETCH_BURST)
+        return _krx_rate_limiter
+
+
+_naver_rate_limiter = None
+_naver_rate_limiter_lock = threading.Lock()
+
+
+def get_naver_rate_limiter():
+    """ 프로세스 전체에서 공유하는 naver(수정주가) 요청 제한기를 반환합니다. """
+    global _naver_rate_limiter
+    with _naver_rate_limiter_lock:
+        if _naver_rate_limiter is None:
+            _naver_rate_limiter = TokenBucket(NAVER_RATE_PER_SEC, NAVER_BURST)
+        return _naver_rate_limiter
+
+
+def split_date_range(fromdate, todate, chunk_days=FETCH_CHUNK_DAYS):
+    """
+    [fromdate, todate] 기간을 chunk_days일씩 겹치지 않는 구간으로 나눕니다.
+
+    Returns:
+      list: [(시작일, 종료일), ...] ('YYYYMMDD', 날짜 순)
+    """
+    start = datetime.datetime.strptime(fromdate, "%Y%m%d").date()
+    end = datetime.datetime.strptime(todate, "%Y%m%d").date()
+    chunks = []
+    while start <= end:
+        chunk_end = min(end, start + datetime.timedelta(days=chunk_days - 1))
+        chunks.append((start.strftime("%Y%m%d"), chunk_end.strftime("%Y%m%d")))
+        start = chunk_end + datetime.timedelta(days=1)
+    return chunks
+
+
+def fetch_with_retry(fetch, *args, rate_limiter=None, max_retries=FETCH_MAX_RETRIES, backoff=FETCH_RETRY_BACKOFF, **kwargs):
+    """
+    fetch(*args, **kwargs)를 한 번 호출합니다. 요청마다 rate_limiter 토큰을 쓰고,
+    예외가 나면 backoff초부터 두 배씩 늘려 가며 max_retries번까지 다시 시도합니다. (마지막 예외는 그대로 올림)
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return fetch(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            label = " ".join(str(arg) for arg in args[:2])
+            logger.warning(f"{getattr(fetch, '__name__', fetch)} {label} 조회 실패, 재시도 {attempt + 1}/{max_retries}: {e}")
+            time.sleep(backoff * 2 ** attempt)
+
+
+def _fetch_chunk(fetch, fromdate, todate, args, kwargs, rate_limiter, max_retries, backoff):
+    """ 구간 하나를 받아 옵니다. (fetch_with_retry로 요청 제한과 재시도 적용) """
+    return fetch_with_retry(
+        fetch, fromdate, todate, *args, rate_limiter=rate_limiter, max_retries=max_retries, backoff=backoff, **kwargs
+    )
+
+
+def fetch_date_range(fetch, fromdate, todate, *args, chunk_days=FETCH_CHUNK_DAYS, max_workers=FETCH_MAX_WORKERS,
+                     rate_limiter=None, max_retries=FETCH_MAX_RETRIES, backoff=FETCH_RETRY_BACKOFF, **kwargs):
+    """
+    fetch(fromdate, todate, *args, **kwargs)를 chunk_days일 구간으로 나눠 스레드 풀에서 동시에 호출하고, 구간 순서대로 이어 붙입니다.
+    모든 요청은 공유 토큰 버킷(rate_limiter, 기본: get_krx_rate_limiter())을 거치므로 동시에 여러 조회가 돌아도 KRX 요청 속도가 제한됩니다.
+    한 구간이 재시도 끝에도 실패하면 전체 조회가 그 예외로 실패합니다.
+
+    Parameters:
+      fetch (callable): 날짜 인덱스 DataFrame/Series를 반환하는 기간 조회 함수 (pykrx krx.*_by_date)
+      fromdate, todate (str): 조회 기간 (YYYYMMDD)
+      chunk_days (int): 구간 길이 (일)
+      max_workers (int): 동시에 받는 구간 수
+
+    Returns:
+      DataFrame/Series: 한 번에 조회한 것과 같은 순서로 이어 붙인 결과
+    """
+    chunks = split_date_range(fromdate, todate, chunk_days)
+    if deferred_fetch.get():
+        # 요청 제한과 재시도는 요청을 실제로 보내는 stock_api_aio가 맡습니다.
+        parts, pending = [], []
+        for chunk_from, chunk_to in chunks:
+            try:
+                parts.append(fetch(chunk_from, chunk_to, *args, **kwargs))
+            except DeferredRequests as deferred:
+                pending.extend(deferred.requests)
+        if pending:
+            raise DeferredRequests(pending)
+        return _merge_parts(parts)
+
+    if rate_limiter is None:
+        rate_limiter = get_krx_rate_limiter()
+    if len(chunks) <= 1:
+        return _fetch_chunk(fetch, fromdate, todate, args, kwargs, rate_limiter, max_retries, backoff)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        parts = list(executor.map(
+            lambda chunk: _fetch_chunk(fetch, chunk[0], chunk[1], args, kwargs, rate_limiter, max_retries, backoff),
+            chunks
+        ))
+    return _merge_parts(parts)
+
+
+def _merge_parts(parts):
+    """ 구간별 결과를 날짜 순서대로 이어 붙입니다. (빈 구간은 건너뜀) """
+    if len(parts) == 1:
+        return parts[0]
+    non_empty = [part for part in parts if len(part)]
+    if not non_empty:
+        return parts[0]
+    # 최신 날짜가 먼저 오는 조회 결과는 구간 순서도 뒤집어 붙입니다.
+    if len(non_empty[0]) > 1 and non_empty[0].index.is_monotonic_decreasing:
+        non_empty = non_empty[::-1]
+    df = pd.concat(non_empty)
+    return df[~df.index.duplicated(keep="first")]
@@ -0,0 +1,130 @@
+# result_cache.py
+# 그리드 최적화 결과 캐시 (데이터 지문 + 파라미터로 키를 만드는 LRU, 선택적 디스크 저장)
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import COMMISSION_RATE, TRANSACTION_TAX_RATE
+
+# 저장 형식이나 백테스트 로직이 바뀌면 올려서 이전 캐시를 무효화합니다.
+_CACHE_VERSION = 3
+
+
+def grid_cache_key(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid):
+    """
+    OHLC 데이터(날짜 포함)와 투자 설정, 그리드 구성으로 결과 캐시 키(sha256 hex)를 만듭니다.
+    같은 데이터와 같은 설정이면 어느 세션에서 요청하든 같은 키가 나옵니다.
+    """
+    h = hashlib.sha256()
+    h.update(repr((_CACHE_VERSION, COMMISSION_RATE, TRANSACTION_TAX_RATE,
+                   float(initial_investment), float(unit_investment), int(max_buy_times))).encode())
+    h.update(np.ascontiguousarray(df.index.values.astype("M8[ns]")).tobytes())
+    for col in ('고가', '저가', '종가'):
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    for grid in (buy_grid, sell_grid):
+        grid = np.ascontiguousarray(grid, dtype=np.float64)
+        h.update(len(grid).to_bytes(8, "little"))
+        h.update(grid.tobytes())
+    return h.hexdigest()
+
+
+class GridResultCache:
+    """
+    그리드 결과를 피클 바이트로 보관하는 LRU 캐시입니다.
+    메모리 사용량이 max_bytes를 넘으면 가장 오래 쓰이지 않은 항목부터 버립니다.
+    disk_dir를 주면 디스크에도 저장해 두고(disk_max_bytes 한도), 메모리에서 빠진 항목은 디스크에서 다시 올립니다.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ 캐시된 결과를 반환합니다. (없으면 None) """
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+        if blob is None and self.disk_dir is not None:
+            blob = self._read_disk(key)
+            if blob is not None:
+                self._store(key, blob)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return pickle.loads(blob)
+
+    def put(self, key, value):
+        """ 결과를 저장합니다. 예산보다 큰 결과는 메모리에는 두지 않고 디스크에만 씁니다. """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, blob)
+        if self.disk_dir is not None:
+            self._write_disk(key, blob)
+
+    def _store(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = blob
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            # 디스크 계층의 LRU 순서는 파일 수정 시각으로 관리합니다.
+            os.utime(path)
+            return blob
+        except OSError:
+            return None
+
+    def _write_disk(self, key, blob):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        if self.disk_max_bytes is not None:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                try:
+                    stat = os.stat(os.path.join(self.disk_dir, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                pass
+            total -= size
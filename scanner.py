@@ -0,0 +1,184 @@
+# scanner.py
+# 유니버스 스캔 (전체 종목/ETF/지수 구성 종목마다 그리드 최적화 후 순위표 작성)
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import stock_api
+from config import (
+    INITIAL_INVESTMENT, UNIT_INVESTMENT, MAX_BUY_TIMES,
+    BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END, BUY_NEXT_PERCENT_STEP,
+    SELL_PERCENT_START, SELL_PERCENT_END, SELL_PERCENT_STEP,
+    PARALLEL_MAX_WORKERS, SCAN_LOAD_WORKERS
+)
+from data_loader import load_ticker_info, load_etf_ticker_info, load_market_data
+from logger import logger
+from strategy import backtest_grid_arrays, expand_grid, price_arrays, returns_frame
+
+LEADERBOARD_COLUMNS = ['유형', '티커', '종목명', '최적 매수 갭 %', '최적 매도 %', '최고 수익률 %', '봉 수', '데이터 로드(초)', '백테스트(초)']
+FAILURE_COLUMNS = ['유형', '티커', '종목명', '오류', '소요(초)']
+
+
+def load_universe(universe, date=None):
+    """
+    스캔할 종목 목록을 가져옵니다.
+
+    Parameters:
+      universe (str): "주식"(KOSPI+KOSDAQ 전체), "ETF"(ETF 전체) 또는 지수 코드 (예: "1028" 코스피 200)
+      date (str, optional): 지수 구성 종목 조회 일자 (YYYYMMDD)
+
+    Returns:
+      list: [(유형, 티커, 이름), ...]
+    """
+    if universe == "주식":
+        return [("주식", ticker, name) for ticker, name in load_ticker_info().items()]
+    if universe == "ETF":
+        return [("ETF", ticker, name) for ticker, name in load_etf_ticker_info().items()]
+
+    tickers = stock_api.get_index_portfolio_deposit_file(universe, date, alternative=True)
+    names = load_ticker_info()
+    return [("주식", ticker, names.get(ticker, ticker)) for ticker in tickers]
+
+
+def _load_ticker(instrument_type, ticker, start_date, end_date):
+    """
+    부모 프로세스의 스레드에서 종목 하나의 고가/저가/종가 배열을 읽습니다. (요청 제한기는 프로세스 전체에서 공유)
+    실패해도 예외 대신 (None, 소요 시간, 오류)로 반환합니다.
+    """
+    started = time.perf_counter()
+    try:
+        df = load_market_data(instrument_type, ticker, start_date, end_date)
+        if df.empty:
+            raise ValueError("데이터 없음")
+        arrays = price_arrays(df)
+    except Exception as e:
+        return None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+    return arrays, time.perf_counter() - started, None
+
+
+def _backtest_ticker(high, low, close, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent):
+    """ 워커 프로세스에서 종목 하나의 그리드 전체를 배치 커널 한 번으로 백테스트합니다. """
+    started = time.perf_counter()
+    total_return = backtest_grid_arrays(
+        high, low, close, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent
+    )
+    return total_return, time.perf_counter() - started
+
+
+def scan_universe(universe_items, start_date, end_date, initial_investment, unit_investment, max_buy_times,
+                  buy_grid, sell_grid, max_workers=None, load_workers=SCAN_LOAD_WORKERS, progress_callback=None):
+    """
+    유니버스의 종목마다 그리드 전체를 ProcessPoolExecutor에서 병렬로 백테스트하고 순위표를 만듭니다.
+    데이터는 부모 프로세스의 스레드 load_workers개가 load_market_data로 받으므로 KRX/naver 요청 제한기 하나를 함께 쓰고,
+    워커 프로세스에는 받은 고가/저가/종가 배열만 넘깁니다. (워커마다 제한기를 따로 두면 요청 속도가 워커 수만큼 늘어남)
+    가격 데이터는 load_market_data의 로컬 캐시를 거치므로 다시 스캔할 때는 새 봉만 받아 옵니다.
+
+    Parameters:
+      universe_items (list): load_universe가 반환한 [(유형, 티커, 이름), ...]
+      start_date, end_date (str): 백테스트 기간 (YYYYMMDD)
+      buy_grid, sell_grid (array-like): 매수 갭 %, 매도 % 후보값
+      max_workers (int, optional): 백테스트 프로세스 수 (기본값: CPU 수)
+      load_workers (int): 데이터를 동시에 받는 스레드 수
+      progress_callback (callable, optional): (끝난 종목 수, 전체 종목 수)를 받는 함수
+
+    Returns:
+      leaderboard (DataFrame): 최고 수익률 순 종목별 최적 조합 (LEADERBOARD_COLUMNS)
+      failures (DataFrame): 실패한 종목과 오류 (FAILURE_COLUMNS)
+    """
+    buy_grid = np.asarray(buy_grid, dtype=np.float64)
+    sell_grid = np.asarray(sell_grid, dtype=np.float64)
+    buy_next_percent, sell_percent = expand_grid(buy_grid, sell_grid)
+    rows, failures = [], []
+    total = len(universe_items)
+    done = 0
+
+    def finish():
+        nonlocal done
+        done += 1
+        if progress_callback is not None:
+            progress_callback(done, total)
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor, \
+            ThreadPoolExecutor(max_workers=load_workers) as loader:
+        loads = {
+            loader.submit(_load_ticker, instrument_type, ticker, start_date, end_date): (instrument_type, ticker, name)
+            for instrument_type, ticker, name in universe_items
+        }
+        backtests = {}
+        # 받은 종목부터 바로 워커에 넘겨 데이터 수집과 백테스트가 겹쳐 진행되게 합니다.
+        for future in as_completed(loads):
+            instrument_type, ticker, name = loads[future]
+            arrays, load_seconds, error = future.result()
+            if arrays is None:
+                failures.append([instrument_type, ticker, name, error, round(load_seconds, 3)])
+                finish()
+                continue
+            high, low, close = arrays
+            backtest = executor.submit(
+                _backtest_ticker, high, low, close, initial_investment, unit_investment, max_buy_times,
+                buy_next_percent, sell_percent
+            )
+            backtests[backtest] = (instrument_type, ticker, name, len(close), load_seconds)
+
+        for future in as_completed(backtests):
+            instrument_type, ticker, name, n_bars, load_seconds = backtests[future]
+            try:
+                total_return, backtest_seconds = future.result()
+            except Exception as e:
+                failures.append([instrument_type, ticker, name, f"{type(e).__name__}: {e}", round(load_seconds, 3)])
+                finish()
+                continue
+            returns = returns_frame(total_return, buy_grid, sell_grid)
+            optimal_i, optimal_j = np.unravel_index(np.argmax(returns.values), returns.shape)
+            rows.append([
+                instrument_type, ticker, name, returns.index[optimal_i].item(), returns.columns[optimal_j].item(),
+                returns.values.max().item(), n_bars, round(load_seconds, 3), round(backtest_seconds, 3)
+            ])
+            finish()
+
+    leaderboard = pd.DataFrame(rows, columns=LEADERBOARD_COLUMNS)
+    leaderboard = leaderboard.sort_values(['최고 수익률 %', '티커'], ascending=[False, True], ignore_index=True)
+    leaderboard.index += 1
+    leaderboard.index.name = '순위'
+    failures = pd.DataFrame(failures, columns=FAILURE_COLUMNS).sort_values('티커', ignore_index=True)
+    return leaderboard, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="유니버스 전체 종목의 매직스플릿 그리드 최적화 순위표를 만듭니다.")
+    parser.add_argument("universe", help='"주식", "ETF" 또는 지수 코드 (예: 1028)')
+    parser.add_argument("--start", default=(datetime.date.today() - datetime.timedelta(days=180)).strftime("%Y%m%d"),
+                        help="시작 날짜 (YYYYMMDD, 기본: 6개월 전)")
+    parser.add_argument("--end", default=datetime.date.today().strftime("%Y%m%d"), help="종료 날짜 (YYYYMMDD, 기본: 오늘)")
+    parser.add_argument("--output", default="scan_leaderboard.csv", help="순위표 CSV 경로 (실패 목록은 *_failures.csv)")
+    parser.add_argument("--workers", type=int, default=PARALLEL_MAX_WORKERS, help="백테스트 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--load-workers", type=int, default=SCAN_LOAD_WORKERS, help="데이터를 동시에 받는 스레드 수")
+    args = parser.parse_args()
+
+    universe_items = load_universe(args.universe, args.end)
+    logger.info(f"유니버스 스캔 시작: {args.universe} {len(universe_items)}종목 ({args.start}~{args.end})")
+    buy_grid = np.arange(BUY_NEXT_PERCENT_START, BUY_NEXT_PERCENT_END + BUY_NEXT_PERCENT_STEP, BUY_NEXT_PERCENT_STEP)
+    sell_grid = np.arange(SELL_PERCENT_START, SELL_PERCENT_END + SELL_PERCENT_STEP, SELL_PERCENT_STEP)
+
+    started = time.perf_counter()
+    leaderboard, failures = scan_universe(
+        universe_items, args.start, args.end, INITIAL_INVESTMENT, UNIT_INVESTMENT, MAX_BUY_TIMES,
+        buy_grid, sell_grid, max_workers=args.workers, load_workers=args.load_workers,
+        progress_callback=lambda done, total: print(f"\r{done}/{total}", end="", flush=True)
+    )
+    print()
+
+    leaderboard.to_csv(args.output, encoding="utf-8-sig")
+    failures_path = f"{os.path.splitext(args.output)[0]}_failures.csv"
+    failures.to_csv(failures_path, index=False, encoding="utf-8-sig")
+    logger.info(f"유니버스 스캔 완료: 성공 {len(leaderboard)} / 실패 {len(failures)}, {time.perf_counter() - started:.1f}초")
+    print(leaderboard.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# search_index.py
+# 종목/ETF 이름 및 티커 검색용 인덱스 (소문자 이름, 초성, n-gram 사전 계산)
+
+# 한글 초성 (호환 자모) 순서: 유니코드 음절 = 0xAC00 + (초성 * 21 + 중성) * 28 + 종성
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_CHOSEONG_SET = set(CHOSEONG)
+
+# 매칭 순위: 완전 일치 > 앞부분 일치 > 중간 일치
+EXACT, PREFIX, CONTAINS = 0, 1, 2
+
+
+def to_choseong(text):
+    """ 한글 음절을 초성으로 바꾼 문자열을 반환합니다. (그 외 문자는 그대로, 길이는 동일) """
+    chars = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        chars.append(CHOSEONG[code // 588] if 0 <= code < 11172 else ch)
+    return "".join(chars)
+
+
+def _ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class TickerSearchIndex:
+    """
+    {티커: 이름} 전체에 대한 검색 인덱스입니다.
+    이름은 미리 소문자/초성으로 바꿔 두고, 1~2글자 n-gram 역색인으로 후보를 좁힌 뒤에만 문자열 비교를 합니다.
+    검색어의 글자가 초성(ㄱ~ㅎ)이면 해당 위치 음절의 초성과 비교하므로 "ㅅㅅㅈㅈ", "삼성ㅈ" 같은 입력도 찾습니다.
+    """
+
+    def __init__(self, tickers):
+        self.codes = list(tickers)
+        self.names = [tickers[code] for code in self.codes]
+        self._codes_lower = [code.lower() for code in self.codes]
+        self._names_lower = [name.lower() for name in self.names]
+        self._names_choseong = [to_choseong(name) for name in self._names_lower]
+
+        # n-gram -> 해당 n-gram이 들어 있는 항목 번호 집합 (이름, 초성 이름, 티커 모두)
+        self._postings = {}
+        for i, (code, name, choseong) in enumerate(zip(self._codes_lower, self._names_lower, self._names_choseong)):
+            for text in (code, name, choseong):
+                for n in (1, 2):
+                    for gram in _ngrams(text, n):
+                        self._postings.setdefault(gram, set()).add(i)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _candidates(self, query):
+        """ 검색어의 n-gram을 모두 포함하는 항목 번호만 돌려줍니다. """
+        grams = _ngrams(query, 2) or _ngrams(query, 1)
+        postings = [self._postings.get(gram, set()) for gram in grams]
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+    def _match_name(self, query, i):
+        """ 이름에서 검색어 위치를 찾아 매칭 순위를 반환합니다. (없으면 None) """
+        name = self._names_lower[i]
+        if not _CHOSEONG_SET.intersection(query):
+            pos = name.find(query)
+        else:
+            choseong = self._names_choseong[i]
+            pos = next((
+                p for p in range(len(name) - len(query) + 1)
+                if all(q == name[p + k] or (q in _CHOSEONG_SET and q == choseong[p + k]) for k, q in enumerate(query))
+            ), -1)
+        if pos < 0:
+            return None
+        if pos == 0:
+            return EXACT if len(query) == len(name) else PREFIX
+        return CONTAINS
+
+    def _match_code(self, query, i):
+        code = self._codes_lower[i]
+        if code == query:
+            return EXACT
+        if code.startswith(query):
+            return PREFIX
+        return CONTAINS if query in code else None
+
+    def search(self, query, limit=None):
+        """
+        검색어가 이름(대소문자 무시, 초성 가능) 또는 티커에 포함된 항목을 순위대로 반환합니다.
+        순위는 (완전 일치 > 앞부분 일치 > 중간 일치, 티커) 순입니다.
+
+        Returns:
+          list: [(티커, 이름), ...]
+        """
+        query = query.lower()
+        if not query:
+            return []
+
+        # 초성이 섞인 검색어는 음절을 모두 초성으로 바꿔 초성 이름의 n-gram으로 후보를 찾습니다.
+        lookup = to_choseong(query) if _CHOSEONG_SET.intersection(query) else query
+        ranked = []
+        for i in self._candidates(lookup):
+            tiers = [tier for tier in (self._match_name(query, i), self._match_code(query, i)) if tier is not None]
+            if tiers:
+                ranked.append((min(tiers), self.codes[i], i))
+        ranked.sort()
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(code, self.names[i]) for _, code, i in ranked]
+
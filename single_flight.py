@@ -0,0 +1,75 @@
+# single_flight.py
+# 같은 키의 동시 요청 합치기 (먼저 온 요청 하나만 실행하고 나머지는 그 결과를 함께 받음)
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 요청을 하나로 합칩니다.
+    처음 들어온 요청(리더)만 fn()을 실행하고, 실행 중에 들어온 같은 키의 요청은 기다렸다가 같은 결과(또는 예외)를 받습니다.
+    실행이 끝나면 키를 지우므로 결과를 저장하지는 않습니다. (캐시는 호출하는 쪽에서)
+    키의 첫 요소(요청 종류)별로 호출 수, 실제 실행 수, 합쳐서 아낀 실행 수를 셉니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def do(self, key, fn):
+        """
+        key로 fn()을 실행하거나, 같은 key가 이미 실행 중이면 그 결과를 기다려 반환합니다.
+
+        Parameters:
+          key (tuple): (요청 종류, ...) 형태의 해시 가능한 키
+          fn (callable): 인자 없이 호출할 함수
+
+        Returns:
+          fn()의 결과 (모든 대기자가 같은 객체를 받으므로 바꿔 쓸 값이면 복사해서 사용)
+        """
+        with self._lock:
+            stats = self._stats.setdefault(key[0], {"calls": 0, "fetches": 0, "shared": 0})
+            stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                stats["fetches"] += 1
+            else:
+                stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """
+        요청 종류별 집계를 반환합니다.
+
+        Returns:
+          dict: {요청 종류: {"calls": 호출 수, "fetches": 실제 실행 수, "shared": 다른 요청의 결과를 받아 아낀 실행 수}}
+        """
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._stats.items()}
@@ -8,6 +8,8 @@ import pandas as pd
 from deprecated import deprecated
 from pandas import DataFrame
 import re
+from trading_calendar import get_trading_calendar
+from range_fetcher import deferred_fetch, fetch_date_range, get_naver_rate_limiter
 
 regex_yymmdd = re.compile(r"\d{4}[-/]?\d{2}[-/]?\d{2}")
 
@@ -38,8 +40,8 @@ def market_valid_check(param=None):
 def resample_ohlcv(df, freq, how):
     """
     :param df   : KRX OLCV format의 DataFrame
-    :param freq : d - 일 / m - 월 / y - 년
-    :return:    : resampling된 DataFrame
+    :param freq : d - 일 / m - 월 / y - 년 / 그 외 pandas 주기 문자열 (예: '60min', '5min') - 분봉/시간봉
+    :return:    : resampling된 DataFrame (분봉/시간봉은 거래가 없는 구간을 제외)
     """
     if freq != 'd' and len(df) > 0:
         if freq == 'm':
@@ -47,8 +49,15 @@ def resample_ohlcv(df, freq, how):
         elif freq == 'y':
             df = df.resample('Y').apply(how)
         else:
-            print("choose a freq parameter in ('m', 'y', 'd')")
-            raise RuntimeError
+            try:
+                offset = pd.tseries.frequencies.to_offset(freq)
+            except ValueError:
+                print("choose a freq parameter in ('m', 'y', 'd') or a pandas offset alias such as '60min'")
+                raise RuntimeError
+            # 구간 경계는 1970-01-01 00:00 기준 (intraday.resample_bars의 index.floor(freq)와 같은 정렬)
+            resampler = df.resample(offset, origin='epoch')
+            df = resampler.apply(how)
+            df = df[resampler.size() > 0]
     return df
 
 
@@ -62,8 +71,11 @@ def get_nearest_business_day_in_a_week(date: str = None, prev: bool = True) \
 
     Returns:
         str: 날짜 (YYMMDD)
+
+    NOTE: 매번 지수 데이터를 받아 확인하지 않고 로컬 영업일 달력(trading_calendar)으로 조회
     """
-    return krx.get_nearest_business_day_in_a_week(date, prev)
+    calendar = get_trading_calendar()
+    return calendar.previous(date) if prev else calendar.next(date)
 
 
 def get_market_ticker_list(date: str = None, market: str = "KOSPI") -> list:
@@ -83,6 +95,28 @@ def get_market_ticker_list(date: str = None, market: str = "KOSPI") -> list:
     return s.index.to_list()
 
 
+def get_market_ticker_and_name(date: str = None, market: str = "KOSPI") \
+        -> dict:
+    """티커와 종목명을 한 번의 요청으로 일괄 조회
+
+    Args:
+        date   (str, optional): 조회 일자 (YYYYMMDD)
+        market (str, optional): 조회 시장 (KOSPI/KOSDAQ/KONEX/ALL)
+
+    Returns:
+        dict: {티커: 종목명}
+
+            >> get_market_ticker_and_name("20210104")
+
+            {'095570': 'AJ네트웍스', '006840': 'AK홀딩스', ...}
+    """
+    if date is None:
+        date = get_nearest_business_day_in_a_week()
+
+    s = krx.get_market_ticker_and_name(date, market)
+    return s.to_dict()
+
+
 def get_market_ticker_name(ticker: str) -> str:
     """티커에 대응되는 종목 이름 반환
 
@@ -96,19 +130,15 @@ def get_market_ticker_name(ticker: str) -> str:
 
 
 def __get_business_days_0(year: int, month: int):
-    strt = f"{year}{month:02}01"
-    if month == 12:
-        last = f"{year+1}0101"
-    else:
-        last = f"{year}{month+1:02}01"
-    df = krx.get_market_ohlcv_by_date(strt, last, "000020")
-    cond = df.index.month[0] == df.index.month
-    return df.index[cond].to_list()
+    today = pd.Timestamp(datetime.date.today())
+    days = get_trading_calendar().month_days(year, month)
+    return [day for day in days if day <= today]
 
 
 def __get_business_days_1(strt: str, last: str):
-    df = krx.get_market_ohlcv_by_date(strt, last, "000020")
-    return df.index.to_list()
+    today = pd.Timestamp(datetime.date.today())
+    days = get_trading_calendar().days(strt, last)
+    return [day for day in days if day <= today]
 
 
 def get_previous_business_days(**kwargs) -> list:
@@ -228,9 +258,12 @@ def get_market_ohlcv_by_date(
     todate = todate.replace("-", "")
 
     if adjusted:
+        # 비동기 조회(stock_api_aio)에서는 요청을 실제로 보낼 때 제한합니다.
+        if not deferred_fetch.get():
+            get_naver_rate_limiter().acquire()
         df = naver.get_market_ohlcv_by_date(fromdate , todate, ticker)
     else:
-        df = krx.get_market_ohlcv_by_date(fromdate, todate, ticker, False)
+        df = fetch_date_range(krx.get_market_ohlcv_by_date, fromdate, todate, ticker, False)
 
     if name_display:
         df.columns.name = get_market_ticker_name(ticker)
@@ -285,11 +318,14 @@ def get_market_ohlcv_by_ticker(
         date = krx.datetime2string(date)
 
     date = date.replace("-", "")
+    if alternative:
+        date = get_trading_calendar().previous(date)
 
     df = krx.get_market_ohlcv_by_ticker(date, market)
     holiday = (df[['시가', '고가', '저가', '종가']] == 0).all(axis=None)
     if holiday and alternative:
-        target_date = get_nearest_business_day_in_a_week(date=date, prev=True)
+        # 달력과 달리 자료가 비어 있으면 (오늘 장 시작 전 등) 직전 영업일로 한 번 더 조회
+        target_date = get_trading_calendar().previous(date, inclusive=False)
         df = krx.get_market_ohlcv_by_ticker(target_date, market)
     return df
 
@@ -377,7 +413,7 @@ def get_market_cap_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_market_cap_by_date(fromdate, todate, ticker)
+    df = fetch_date_range(krx.get_market_cap_by_date, fromdate, todate, ticker)
 
     how = {
         '시가총액': 'last',
@@ -418,12 +454,15 @@ def get_market_cap_by_ticker(
         date = krx.datetime2string(date)
 
     date = date.replace("-", "")
+    if alternative:
+        date = get_trading_calendar().previous(date)
 
     df = krx.get_market_cap_by_ticker(date, market, acending)
     holiday = (df[['종가', '시가총액', '거래량', '거래대금']] == 0) \
         .all(axis=None)
     if holiday and alternative:
-        target_date = get_nearest_business_day_in_a_week(date=date, prev=True)
+        # 달력과 달리 자료가 비어 있으면 (오늘 장 시작 전 등) 직전 영업일로 한 번 더 조회
+        target_date = get_trading_calendar().previous(date, inclusive=False)
         df = krx.get_market_cap_by_ticker(target_date, market, acending)
     return df
 
@@ -512,7 +551,8 @@ def get_exhaustion_rates_of_foreign_investment_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    return krx.get_exhaustion_rates_of_foreign_investment_by_date(
+    return fetch_date_range(
+        krx.get_exhaustion_rates_of_foreign_investment_by_date,
         fromdate, todate, ticker)
 
 
@@ -725,7 +765,7 @@ def get_market_fundamental_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_market_fundamental_by_date(fromdate, todate, ticker)
+    df = fetch_date_range(krx.get_market_fundamental_by_date, fromdate, todate, ticker)
 
     if df.empty:
         return df
@@ -1051,10 +1091,12 @@ def get_market_trading_value_by_date(
     todate = todate.replace("-", "")
 
     if ticker in ["KOSPI", "KOSDAQ", "KONEX", "ALL"]:
-        df = krx.get_market_trading_value_and_volume_on_market_by_date(
+        df = fetch_date_range(
+            krx.get_market_trading_value_and_volume_on_market_by_date,
             fromdate, todate, ticker, etf, etn, elw, "거래대금", on, detail)
     else:
-        df = krx.get_market_trading_value_and_volume_on_ticker_by_date(
+        df = fetch_date_range(
+            krx.get_market_trading_value_and_volume_on_ticker_by_date,
             fromdate, todate, ticker, "거래대금", on, detail)
     return resample_ohlcv(df, freq, sum)
 
@@ -1116,10 +1158,12 @@ def get_market_trading_volume_by_date(
     todate = todate.replace("-", "")
 
     if ticker in ["KOSPI", "KOSDAQ", "KONEX", "ALL"]:
-        df = krx.get_market_trading_value_and_volume_on_market_by_date(
+        df = fetch_date_range(
+            krx.get_market_trading_value_and_volume_on_market_by_date,
             fromdate, todate, ticker, etf, etn, elw, "거래량", on, detail)
     else:
-        df = krx.get_market_trading_value_and_volume_on_ticker_by_date(
+        df = fetch_date_range(
+            krx.get_market_trading_value_and_volume_on_ticker_by_date,
             fromdate, todate, ticker, "거래량", on, detail)
     return resample_ohlcv(df, freq, sum)
 
@@ -1271,16 +1315,19 @@ def get_index_portfolio_deposit_file(
         target_date = krx.datetime2string(target_date)
 
     target_date = target_date.replace("-", "")
+    requested_date = target_date
+    # 주말 or 비영업일이면 로컬 영업일 달력으로 과거의 가장 가까운 영업일을 찾아 조회
+    if alternative:
+        target_date = get_trading_calendar().previous(target_date)
 
     pdf = krx.get_index_portfolio_deposit_file(target_date, ticker)
-    # 주말 or 비영업일 여부를 확인하는 것 자체가 상대적으로 오랜 시간 걸려 lazy 판단
-    # - 결과가 없으면 과거의 가장 가까운 영업일로 조회
+    # 달력과 달리 결과가 없으면 (오늘 장 시작 전 등) 직전 영업일로 한 번 더 조회
     if len(pdf) == 0 and alternative:
-        target_date = get_nearest_business_day_in_a_week(target_date)
+        target_date = get_trading_calendar().previous(target_date, inclusive=False)
         pdf = krx.get_index_portfolio_deposit_file(target_date, ticker)
-        if len(pdf) != 0 and date is not None:
-            print(f"The date you entered {date} seems to be a holiday. PYKRX "
-                  f"changes the date parameter to {target_date}.")
+    if len(pdf) != 0 and date is not None and target_date != requested_date:
+        print(f"The date you entered {date} seems to be a holiday. PYKRX "
+              f"changes the date parameter to {target_date}.")
     return pdf
 
 
@@ -1427,7 +1474,7 @@ def get_index_ohlcv_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_index_ohlcv_by_date(fromdate, todate, ticker)
+    df = fetch_date_range(krx.get_index_ohlcv_by_date, fromdate, todate, ticker)
 
     if name_display:
         df.columns.name = get_index_ticker_name(ticker)
@@ -1570,7 +1617,7 @@ def get_index_fundamental_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_index_fundamental_by_date(fromdate, todate, ticker)
+    df = fetch_date_range(krx.get_index_fundamental_by_date, fromdate, todate, ticker)
     return df
 
 
@@ -1763,7 +1810,7 @@ def get_shorting_status_by_date(fromdate: str, todate: str, ticker: str) \
             2021-01-07   763  2447030   63634800  202858787000
             2021-01-08     6  2319328     534000  205956326400
     """
-    return krx.get_shorting_status_by_date(fromdate, todate, ticker)
+    return fetch_date_range(krx.get_shorting_status_by_date, fromdate, todate, ticker)
 
 
 @market_valid_check(["KOSPI", "KOSDAQ", "KONEX"])
@@ -1893,7 +1940,8 @@ def get_shorting_volume_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_shorting_trading_value_and_volume_by_date(
+    df = fetch_date_range(
+        krx.get_shorting_trading_value_and_volume_by_date,
         fromdate, todate, ticker)
     return df['거래량']
 
@@ -1929,7 +1977,8 @@ def get_shorting_value_by_date(fromdate: str, todate: str, ticker: str)  \
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_shorting_trading_value_and_volume_by_date(
+    df = fetch_date_range(
+        krx.get_shorting_trading_value_and_volume_by_date,
         fromdate, todate, ticker)
     return df['거래대금']
 
@@ -1965,7 +2014,8 @@ def get_shorting_investor_volume_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    return krx.get_shorting_investor_by_date(
+    return fetch_date_range(
+        krx.get_shorting_investor_by_date,
         fromdate, todate, market, "거래량")
 
 
@@ -2001,7 +2051,8 @@ def get_shorting_investor_value_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    return krx.get_shorting_investor_by_date(
+    return fetch_date_range(
+        krx.get_shorting_investor_by_date,
         fromdate, todate, market, "거래대금")
 
 
@@ -2199,7 +2250,7 @@ def get_shorting_balance_by_date(fromdate: str, todate: str, ticker: str) \
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    return krx.get_shorting_balance_by_date(fromdate, todate, ticker)
+    return fetch_date_range(krx.get_shorting_balance_by_date, fromdate, todate, ticker)
 
 
 # -----------------------------------------------------------------------------
@@ -2257,6 +2308,28 @@ def get_etf_ticker_list(date: str = None) -> list:
     return krx.get_etx_ticker_list(date, "ETF")
 
 
+def get_etf_ticker_and_name(date: str = None) -> dict:
+    """ETF 티커와 종목명 일괄 조회
+
+    ETF 기본 정보는 한 번에 내려받아 메모리에 보관되므로, 목록 조회 이후의
+    이름 조회는 추가 요청 없이 처리된다.
+
+    Args:
+        date (str, optional): 조회 일자 (YYMMDD)
+         - 입력하지 않을 경우 당일 기준 티커 조회
+
+    Returns:
+        dict: {티커: 종목명}
+
+            >> get_etf_ticker_and_name("20021014")
+
+            {'069500': 'KODEX 200', '069660': 'KOSEF 200'}
+    """
+
+    return {ticker: krx.get_etx_name(ticker)
+            for ticker in get_etf_ticker_list(date)}
+
+
 def get_etn_ticker_list(date: str = None) -> list:
     """ETN 티커 목록 조회
 
@@ -2415,7 +2488,7 @@ def get_etf_ohlcv_by_date(
     fromdate = fromdate.replace("-", "")
     todate = todate.replace("-", "")
 
-    df = krx.get_etf_ohlcv_by_date(fromdate, todate, ticker)
+    df = fetch_date_range(krx.get_etf_ohlcv_by_date, fromdate, todate, ticker)
 
     how = {
         'NAV': 'first',
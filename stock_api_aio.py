@@ -0,0 +1,227 @@
+# stock_api_aio.py
+# stock_api 주요 조회 함수의 asyncio 버전 (공유 HTTP 연결 풀 + 동시 요청 수 제한)
+import asyncio
+import contextlib
+import contextvars
+import threading
+import weakref
+from collections import namedtuple
+
+import httpx
+from pykrx.website.comm import webio
+
+import stock_api
+from config import (
+    AIO_MAX_CONCURRENCY, AIO_MAX_CONNECTIONS, AIO_TIMEOUT, AIO_KRX_URL, AIO_NAVER_URL,
+    FETCH_MAX_RETRIES, FETCH_RETRY_BACKOFF
+)
+from logger import logger
+from range_fetcher import DeferredRequests, deferred_fetch, get_krx_rate_limiter, get_naver_rate_limiter
+
+# 비동기 함수는 stock_api의 동기 함수를 그대로 실행하되, pykrx가 HTTP 요청을 보내는 지점(webio.Get/Post.read)에서
+# 받아 둔 응답이 없으면 DeferredRequests로 요청을 올려 보냅니다. 요청들을 공유 세션으로 한꺼번에 받은 뒤
+# 같은 함수를 처음부터 다시 실행하면 이번에는 받아 둔 응답으로 끝까지(또는 다음 요청까지) 진행합니다.
+# 응답 해석과 후처리(컬럼 정리, 리샘플링, 휴장일 대체)는 동기 함수와 같은 코드를 쓰므로 결과도 같습니다.
+# read 교체는 비동기 조회가 동기 함수를 실행하는 동안에만 걸어 두고, 끝나면 pykrx의 원래 read로 되돌립니다.
+
+_KRX_URL = "https://data.krx.co.kr"
+_NAVER_URL = "http://fchart.stock.naver.com"
+
+_Request = namedtuple("_Request", ["method", "url", "params", "headers"])
+
+# 실행 중인 조회 함수가 쓸 응답 {요청 키: 응답} (태스크마다 따로)
+_responses = contextvars.ContextVar("_responses", default=None)
+
+
+def _request_key(method, url, params):
+    return method, url, tuple(sorted((key, str(value)) for key, value in params.items()))
+
+
+def _request_headers(io):
+    """ webio.Get/Post.read와 같은 방식으로 요청 헤더를 만듭니다. (KRX 로그인 세션이 있으면 쿠키 포함) """
+    krxs = webio.get_session()
+    if krxs is None:
+        return dict(io.headers)
+    headers = krxs.get_headers()
+    headers.update(io.headers)
+    return headers
+
+
+def _deferred_read(read, method):
+    """ 응답을 모으는 중이면 받아 둔 응답을 돌려주거나 요청을 올려 보내고, 아니면 원래 read를 호출합니다. """
+    def deferred(self, **params):
+        responses = _responses.get()
+        if responses is None:
+            return read(self, **params)
+        key = _request_key(method, self.url, params)
+        if key in responses:
+            return responses[key]
+        raise DeferredRequests([_Request(method, self.url, params, _request_headers(self))])
+    return deferred
+
+
+_READ_CLASSES = ((webio.Get, "GET"), (webio.Post, "POST"))
+# 지금 read 교체를 쓰고 있는 실행 수와 교체 전 원래 read (여러 스레드의 이벤트 루프가 함께 씀)
+_hook_users = 0
+_original_reads = {}
+_hook_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _deferred_reads():
+    """
+    블록 안에서만 webio.Get/Post.read를 _deferred_read로 바꿔 둡니다. 겹쳐 실행되면 마지막으로 나가는 쪽이 되돌립니다.
+    교체된 동안 다른 스레드의 동기 조회는 _responses가 비어 있으므로 원래 read를 그대로 탑니다.
+    """
+    global _hook_users
+    with _hook_lock:
+        if _hook_users == 0:
+            for cls, method in _READ_CLASSES:
+                _original_reads[cls] = cls.read
+                cls.read = _deferred_read(cls.read, method)
+        _hook_users += 1
+    try:
+        yield
+    finally:
+        with _hook_lock:
+            _hook_users -= 1
+            if _hook_users == 0:
+                for cls, _ in _READ_CLASSES:
+                    cls.read = _original_reads.pop(cls)
+
+
+# ---- 공유 세션 ----
+
+# 이벤트 루프별 (HTTP 클라이언트, 동시 요청 세마포어) — 클라이언트와 세마포어는 만든 루프에서만 쓸 수 있습니다.
+_sessions = weakref.WeakKeyDictionary()
+
+
+def _get_session():
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=AIO_MAX_CONNECTIONS, max_keepalive_connections=AIO_MAX_CONNECTIONS),
+            timeout=AIO_TIMEOUT
+        )
+        session = _sessions[loop] = (client, asyncio.Semaphore(AIO_MAX_CONCURRENCY))
+    return session
+
+
+async def close_session():
+    """ 현재 이벤트 루프의 공유 HTTP 세션을 닫습니다. (루프를 끝내기 전에 호출) """
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session[0].aclose()
+
+
+async def _send(request):
+    """
+    요청 하나를 공유 세션으로 보냅니다. KRX/naver 요청은 동기 조회와 같은 토큰 버킷으로 속도를 제한하고,
+    연결 오류와 5xx/429 응답은 FETCH_RETRY_BACKOFF초부터 두 배씩 늘려 가며 FETCH_MAX_RETRIES번까지 다시 보냅니다.
+    """
+    client, semaphore = _get_session()
+    url = request.url
+    rate_limiter = None
+    if url.startswith(_KRX_URL):
+        url = AIO_KRX_URL + url[len(_KRX_URL):]
+        rate_limiter = get_krx_rate_limiter()
+    elif url.startswith(_NAVER_URL):
+        url = AIO_NAVER_URL + url[len(_NAVER_URL):]
+        rate_limiter = get_naver_rate_limiter()
+
+    for attempt in range(FETCH_MAX_RETRIES + 1):
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async()
+        try:
+            async with semaphore:
+                if request.method == "POST":
+                    response = await client.post(url, data=request.params, headers=request.headers)
+                else:
+                    response = await client.get(url, params=request.params, headers=request.headers)
+            if (response.status_code < 500 and response.status_code != 429) or attempt == FETCH_MAX_RETRIES:
+                return response
+            error = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            if attempt == FETCH_MAX_RETRIES:
+                raise
+            error = e
+        logger.warning(f"{url} 요청 실패, 재시도 {attempt + 1}/{FETCH_MAX_RETRIES}: {error}")
+        await asyncio.sleep(FETCH_RETRY_BACKOFF * 2 ** attempt)
+
+
+async def _run(fn, *args, **kwargs):
+    """ 동기 조회 함수 fn을, 필요한 HTTP 요청을 비동기로 받아 가며 끝까지 실행합니다. """
+    responses = {}
+    while True:
+        responses_token = _responses.set(responses)
+        deferred_token = deferred_fetch.set(True)
+        try:
+            with _deferred_reads():
+                return fn(*args, **kwargs)
+        except DeferredRequests as deferred:
+            pending = deferred.requests
+        finally:
+            _responses.reset(responses_token)
+            deferred_fetch.reset(deferred_token)
+
+        requests = {}
+        for request in pending:
+            requests.setdefault(_request_key(request.method, request.url, request.params), request)
+        if all(key in responses for key in requests):
+            raise RuntimeError(f"{fn.__name__}: 받아 둔 응답으로 진행할 수 없습니다.")
+        keys = [key for key in requests if key not in responses]
+        results = await asyncio.gather(*(_send(requests[key]) for key in keys))
+        responses.update(zip(keys, results))
+
+
+# ---- 조회 함수 (인자와 반환값은 stock_api의 같은 이름 함수와 동일) ----
+
+async def get_market_ohlcv_by_date(fromdate, todate, ticker, freq='d', adjusted=True, name_display=False):
+    """ stock_api.get_market_ohlcv_by_date의 비동기 버전 (긴 기간의 KRX 조회는 구간 요청을 동시에 보냄) """
+    return await _run(stock_api.get_market_ohlcv_by_date, fromdate, todate, ticker, freq, adjusted, name_display)
+
+
+async def get_etf_ohlcv_by_date(fromdate, todate, ticker, freq='d'):
+    """ stock_api.get_etf_ohlcv_by_date의 비동기 버전 """
+    return await _run(stock_api.get_etf_ohlcv_by_date, fromdate, todate, ticker, freq)
+
+
+async def get_market_cap_by_ticker(date, market="ALL", acending=False, alternative=False):
+    """ stock_api.get_market_cap_by_ticker의 비동기 버전 """
+    return await _run(stock_api.get_market_cap_by_ticker, date, market, acending, alternative)
+
+
+async def get_market_fundamental_by_date(fromdate, todate, ticker, freq='d', name_display=False):
+    """ stock_api.get_market_fundamental_by_date의 비동기 버전 """
+    return await _run(stock_api.get_market_fundamental_by_date, fromdate, todate, ticker, freq, name_display)
+
+
+async def get_market_ticker_list(date=None, market="KOSPI"):
+    """ stock_api.get_market_ticker_list의 비동기 버전 """
+    return await _run(stock_api.get_market_ticker_list, date, market)
+
+
+async def get_market_ticker_and_name(date=None, market="KOSPI"):
+    """ stock_api.get_market_ticker_and_name의 비동기 버전 """
+    return await _run(stock_api.get_market_ticker_and_name, date, market)
+
+
+async def get_market_ticker_name(ticker):
+    """ stock_api.get_market_ticker_name의 비동기 버전 """
+    return await _run(stock_api.get_market_ticker_name, ticker)
+
+
+async def get_etf_ticker_list(date=None):
+    """ stock_api.get_etf_ticker_list의 비동기 버전 """
+    return await _run(stock_api.get_etf_ticker_list, date)
+
+
+async def get_etf_ticker_and_name(date=None):
+    """ stock_api.get_etf_ticker_and_name의 비동기 버전 """
+    return await _run(stock_api.get_etf_ticker_and_name, date)
+
+
+async def get_etf_ticker_name(ticker):
+    """ stock_api.get_etf_ticker_name의 비동기 버전 """
+    return await _run(stock_api.get_etf_ticker_name, ticker)
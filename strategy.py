@@ -1,9 +1,15 @@
 # strategy.py
+import numpy as np
+import pandas as pd
 from config import COMMISSION_RATE, TRANSACTION_TAX_RATE
+from price_index import PriceCrossingIndex
+from trade_log import EVENT_DTYPE, TradeLog
 
 def calculate_number_of_shares_to_buy(cash_available, unit_investment, price, commission_rate=COMMISSION_RATE):
     """
     매수 가능한 주식 수를 계산합니다.
+    floor(투자 한도 / (가격 * (1 + 수수료율)))는 실수 연산 반올림 때문에 현금을 넘는 경우가 있어도 1주 차이이므로,
+    한 번만 줄여 보고 그래도 넘는 (사실상 없는) 경우에만 한 주씩 줄이는 반복으로 넘어갑니다.
     """
     max_investment = min(cash_available, unit_investment)
     number_of_shares = int(max_investment // (price * (1 + commission_rate)))
@@ -11,12 +17,47 @@ def calculate_number_of_shares_to_buy(cash_available, unit_investment, price, co
         return 0, 0, 0
     total_cost = number_of_shares * price
     commission = total_cost * commission_rate
-    total_cost_including_commission = total_cost + commission
-    while total_cost_including_commission > cash_available and number_of_shares > 0:
+    if total_cost + commission > cash_available:
         number_of_shares -= 1
         total_cost = number_of_shares * price
         commission = total_cost * commission_rate
-        total_cost_including_commission = total_cost + commission
+        while total_cost + commission > cash_available and number_of_shares > 0:
+            number_of_shares -= 1
+            total_cost = number_of_shares * price
+            commission = total_cost * commission_rate
+    return number_of_shares, total_cost, commission
+
+def calculate_number_of_shares_to_buy_array(cash_available, unit_investment, price, commission_rate=COMMISSION_RATE):
+    """
+    calculate_number_of_shares_to_buy의 배열 버전입니다. 조합마다 현금/가격이 다른 매수를 한 번에 계산하며,
+    원소마다 스칼라 버전과 같은 값을 반환합니다.
+
+    Parameters:
+      cash_available (ndarray): 조합별 현금
+      unit_investment (int): 1회 매수 금액
+      price (ndarray or float): 조합별 매수 가격
+
+    Returns:
+      number_of_shares (ndarray[int64]), total_cost (ndarray), commission (ndarray)
+    """
+    cash_available = np.asarray(cash_available, dtype=np.float64)
+    price = np.broadcast_to(np.asarray(price, dtype=np.float64), cash_available.shape)
+    max_investment = np.minimum(cash_available, unit_investment)
+    # numpy의 실수 floor_divide는 파이썬 //와 같은 규칙으로 계산됩니다.
+    number_of_shares = np.floor_divide(max_investment, price * (1 + commission_rate)).astype(np.int64)
+    total_cost = number_of_shares * price
+    commission = total_cost * commission_rate
+
+    over = (total_cost + commission > cash_available) & (number_of_shares > 0)
+    if over.any():
+        number_of_shares[over] -= 1
+        total_cost[over] = number_of_shares[over] * price[over]
+        commission[over] = total_cost[over] * commission_rate
+        still_over = over & (total_cost + commission > cash_available) & (number_of_shares > 0)
+        for i in np.flatnonzero(still_over).tolist():
+            number_of_shares[i], total_cost[i], commission[i] = calculate_number_of_shares_to_buy(
+                cash_available[i].item(), unit_investment, price[i].item(), commission_rate
+            )
     return number_of_shares, total_cost, commission
 
 def calculate_proceeds_from_selling(number_of_shares, sell_price, commission_rate=COMMISSION_RATE, transaction_tax_rate=TRANSACTION_TAX_RATE):
@@ -29,33 +70,65 @@ def calculate_proceeds_from_selling(number_of_shares, sell_price, commission_rat
     net_proceeds = total_proceeds - commission - transaction_tax
     return net_proceeds, commission, transaction_tax
 
-def run_backtest(df, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent):
+def price_arrays(df):
     """
-    단일 파라미터 조합에 대해 백테스트를 실행합니다.
+    고가/저가/종가 컬럼을 연속된 float64 배열로 한 번만 꺼냅니다.
+    """
+    high = np.ascontiguousarray(df['고가'].to_numpy(dtype=np.float64))
+    low = np.ascontiguousarray(df['저가'].to_numpy(dtype=np.float64))
+    close = np.ascontiguousarray(df['종가'].to_numpy(dtype=np.float64))
+    return high, low, close
+
+def new_backtest_state(initial_investment):
+    """
+    단일 백테스트의 시작 상태를 만듭니다. (파이썬 기본 값만 담은 dict)
+    _backtest_kernel에 넘기면 끝난 시점의 상태로 갱신되므로, 다음 구간 데이터로 이어서 실행할 수 있습니다.
+    """
+    return {
+        'cash': initial_investment,
+        'holdings': 0,
+        'buy_count': 0,
+        # 매수 차수 스택 (차수별 매수가, 수량)
+        'level_prices': [],
+        'level_shares': [],
+        'waiting_for_initial_price': False,
+        'initial_buy_price': None,
+    }
+
+def _backtest_kernel(dates, high, low, close, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+                     record_trades=True, crossing_index=None, state=None):
+    """
+    float64 가격 배열 위에서 분할 매수/분할 매도 상태 기계를 실행합니다.
+    각 봉마다 저가 -> 고가 -> 종가 순서로 가격을 확인합니다 (기존 iterrows 구현과 동일).
+    record_trades=False이면 매매 내역을 만들지 않고 현금/보유 수량/매수 차수 스택만 추적합니다.
+    crossing_index(PriceCrossingIndex)를 주면 매 봉이 끝날 때 다음 매수/매도 기준가에 닿는 첫 봉으로 바로 건너뜁니다.
+    state(new_backtest_state)를 주면 그 상태에서 시작하고, 끝난 뒤의 상태를 다시 state에 기록합니다.
     반환값:
-      - trade_history: 매매 내역 리스트
-      - final_value: 최종 포트폴리오 가치
-      - total_return: 총 수익률 (%)
+      - trade_history: 매매 내역 TradeLog (record_trades=False이면 None, 봉 번호는 이번 입력 기준)
+      - cash: 최종 현금
+      - holdings: 최종 보유 수량
     """
     buy_next_percent_decimal = buy_next_percent / 100
     sell_percent_decimal = sell_percent / 100
 
-    holdings = 0
-    cash = initial_investment
-    buy_count = 0
-    buy_levels = []
-    trade_history = []
-    waiting_for_initial_price = False
-    initial_buy_price = None
-
-    for date, row in df.iterrows():
-        high = row['고가']
-        low = row['저가']
-        close = row['종가']
-
-        price_sequence = [('low', low), ('high', high), ('close', close)]
-        
-        for price_type, price in price_sequence:
+    if state is None:
+        state = new_backtest_state(initial_investment)
+    holdings = state['holdings']
+    cash = state['cash']
+    buy_count = state['buy_count']
+    level_prices = state['level_prices']
+    level_shares = state['level_shares']
+    trades = [] if record_trades else None
+    waiting_for_initial_price = state['waiting_for_initial_price']
+    initial_buy_price = state['initial_buy_price']
+
+    # ndarray 원소 접근보다 파이썬 float 리스트 순회가 훨씬 빠르므로 한 번만 변환합니다.
+    lows, highs, closes = low.tolist(), high.tolist(), close.tolist()
+    n_bars = len(closes)
+    i = 0
+    while i < n_bars:
+        low_price, high_price, close_price = lows[i], highs[i], closes[i]
+        for is_close, price in ((False, low_price), (False, high_price), (True, close_price)):
             # 만약 매도 후 초기 상태라면, 지정한 가격 이하에서 다시 매수 시작
             if waiting_for_initial_price:
                 if initial_buy_price is not None and price <= initial_buy_price and cash >= unit_investment:
@@ -65,14 +138,13 @@ def run_backtest(df, initial_investment, unit_investment, max_buy_times, buy_nex
                         holdings += number_of_shares
                         cash -= total_cost_including_commission
                         buy_count = 1
-                        buy_levels.append({'price': initial_buy_price, 'shares': number_of_shares})
-                        trade_history.append({
-                            'Date': date, 'Type': 'Buy', 'Price': initial_buy_price, 
-                            'Holdings': holdings, 'Cash': cash, 'Buy_Count': buy_count, 'Shares': number_of_shares
-                        })
+                        level_prices.append(initial_buy_price)
+                        level_shares.append(number_of_shares)
+                        if record_trades:
+                            trades.append((0, i, False, initial_buy_price, number_of_shares, holdings, cash, buy_count))
                         waiting_for_initial_price = False
             else:
-                if buy_count == 0 and cash >= unit_investment and price_type == 'close':
+                if buy_count == 0 and cash >= unit_investment and is_close:
                     # 첫 매수
                     buy_price = price
                     number_of_shares, total_cost, commission = calculate_number_of_shares_to_buy(cash, unit_investment, buy_price)
@@ -82,14 +154,13 @@ def run_backtest(df, initial_investment, unit_investment, max_buy_times, buy_nex
                         cash -= total_cost_including_commission
                         initial_buy_price = buy_price
                         buy_count = 1
-                        buy_levels.append({'price': buy_price, 'shares': number_of_shares})
-                        trade_history.append({
-                            'Date': date, 'Type': 'Buy', 'Price': buy_price, 
-                            'Holdings': holdings, 'Cash': cash, 'Buy_Count': buy_count, 'Shares': number_of_shares
-                        })
+                        level_prices.append(buy_price)
+                        level_shares.append(number_of_shares)
+                        if record_trades:
+                            trades.append((0, i, False, buy_price, number_of_shares, holdings, cash, buy_count))
                 elif buy_count > 0:
                     # 추가 매수 조건
-                    target_buy_price = buy_levels[-1]['price'] * (1 - buy_next_percent_decimal)
+                    target_buy_price = level_prices[-1] * (1 - buy_next_percent_decimal)
                     if price <= target_buy_price and buy_count < max_buy_times and cash >= unit_investment:
                         buy_price = target_buy_price
                         number_of_shares, total_cost, commission = calculate_number_of_shares_to_buy(cash, unit_investment, buy_price)
@@ -98,67 +169,351 @@ def run_backtest(df, initial_investment, unit_investment, max_buy_times, buy_nex
                             holdings += number_of_shares
                             cash -= total_cost_including_commission
                             buy_count += 1
-                            buy_levels.append({'price': buy_price, 'shares': number_of_shares})
-                            trade_history.append({
-                                'Date': date, 'Type': 'Buy', 'Price': buy_price, 
-                                'Holdings': holdings, 'Cash': cash, 'Buy_Count': buy_count, 'Shares': number_of_shares
-                            })
+                            level_prices.append(buy_price)
+                            level_shares.append(number_of_shares)
+                            if record_trades:
+                                trades.append((0, i, False, buy_price, number_of_shares, holdings, cash, buy_count))
                     # 매도 조건
-                    target_sell_price = buy_levels[-1]['price'] * (1 + sell_percent_decimal)
+                    target_sell_price = level_prices[-1] * (1 + sell_percent_decimal)
                     if price >= target_sell_price:
                         sell_price = target_sell_price
-                        last_buy_level = buy_levels[-1]
-                        number_of_shares_to_sell = last_buy_level['shares']
+                        number_of_shares_to_sell = level_shares[-1]
                         net_proceeds, _, _ = calculate_proceeds_from_selling(number_of_shares_to_sell, sell_price)
                         holdings -= number_of_shares_to_sell
                         cash += net_proceeds
-                        trade_history.append({
-                            'Date': date, 'Type': 'Sell', 'Price': sell_price, 
-                            'Holdings': holdings, 'Cash': cash, 'Buy_Count': buy_count, 'Shares': number_of_shares_to_sell
-                        })
+                        if record_trades:
+                            trades.append((0, i, True, sell_price, number_of_shares_to_sell, holdings, cash, buy_count))
                         buy_count -= 1
-                        buy_levels.pop()
+                        level_prices.pop()
+                        level_shares.pop()
                         if buy_count == 0:
                             waiting_for_initial_price = True
 
-    final_value = cash + holdings * df.iloc[-1]['종가']
+        i += 1
+        if crossing_index is not None and i < n_bars:
+            # 상태가 바뀔 수 있는 다음 봉으로 건너뜁니다. (현금은 매매할 때만 바뀌므로 그 사이 조건은 고정)
+            if waiting_for_initial_price:
+                i = crossing_index.next_at_or_below(i, initial_buy_price) if cash >= unit_investment else n_bars
+            elif buy_count == 0:
+                if cash < unit_investment:
+                    i = n_bars
+            else:
+                next_bar = crossing_index.next_at_or_above(i, level_prices[-1] * (1 + sell_percent_decimal))
+                if buy_count < max_buy_times and cash >= unit_investment:
+                    next_bar = min(next_bar, crossing_index.next_at_or_below(i, level_prices[-1] * (1 - buy_next_percent_decimal)))
+                i = next_bar
+
+    state.update(
+        cash=cash, holdings=holdings, buy_count=buy_count,
+        waiting_for_initial_price=waiting_for_initial_price, initial_buy_price=initial_buy_price
+    )
+    trade_history = TradeLog.from_events(dates, np.array(trades, dtype=EVENT_DTYPE)) if record_trades else None
+    return trade_history, cash, holdings
+
+def run_backtest(df, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent, record_trades=True):
+    """
+    단일 파라미터 조합에 대해 백테스트를 실행합니다.
+    수익률만 필요하면 record_trades=False로 매매 내역을 만들지 않고 실행합니다.
+    반환값:
+      - trade_history: 매매 내역 TradeLog (record_trades=False이면 None)
+      - final_value: 최종 포트폴리오 가치
+      - total_return: 총 수익률 (%)
+    """
+    high, low, close = price_arrays(df)
+    trade_history, cash, holdings = _backtest_kernel(
+        df.index, high, low, close, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+        record_trades
+    )
+
+    final_value = cash + holdings * close[-1]
+    total_return = (final_value - initial_investment) / initial_investment * 100
+
+    return trade_history, final_value, total_return
+
+def run_backtest_event_driven(df, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+                              record_trades=True, crossing_index=None):
+    """
+    run_backtest와 같은 결과를 내지만, 매매가 일어날 수 없는 봉은 건너뛰어 비용이 봉 수가 아닌 매매 수에 비례합니다.
+    긴 기간이나 분봉처럼 봉이 많고 매매가 드문 데이터에 유리합니다.
+
+    Parameters:
+      crossing_index (PriceCrossingIndex, optional): 같은 df로 만든 인덱스 (여러 파라미터에 재사용할 때 전달)
+
+    반환값:
+      - trade_history: 매매 내역 TradeLog (record_trades=False이면 None)
+      - final_value: 최종 포트폴리오 가치
+      - total_return: 총 수익률 (%)
+    """
+    high, low, close = price_arrays(df)
+    if crossing_index is None:
+        crossing_index = PriceCrossingIndex(high, low, close)
+    trade_history, cash, holdings = _backtest_kernel(
+        df.index, high, low, close, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+        record_trades, crossing_index
+    )
+
+    final_value = cash + holdings * close[-1]
     total_return = (final_value - initial_investment) / initial_investment * 100
 
     return trade_history, final_value, total_return
 
+class StreamingBacktest:
+    """
+    OHLC 봉을 여러 조각(DataFrame)으로 나누어 받아 이어서 백테스트합니다.
+    조각 사이에는 상태(new_backtest_state)만 들고 있으므로, 분봉처럼 큰 데이터도 한 DataFrame으로 만들지 않고
+    run_backtest와 같은 결과를 얻습니다.
+    """
+
+    def __init__(self, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+                 record_trades=True, skip_idle_bars=False):
+        self.initial_investment = initial_investment
+        self.unit_investment = unit_investment
+        self.max_buy_times = max_buy_times
+        self.buy_next_percent = buy_next_percent
+        self.sell_percent = sell_percent
+        self.record_trades = record_trades
+        self.skip_idle_bars = skip_idle_bars
+        self.state = new_backtest_state(initial_investment)
+        self.n_bars = 0
+        self.last_close = None
+        self._trade_logs = []
+
+    def feed(self, df):
+        """ 다음 구간의 OHLC DataFrame을 처리합니다. (시간 순서대로 호출) """
+        if len(df) == 0:
+            return
+        high, low, close = price_arrays(df)
+        crossing_index = PriceCrossingIndex(high, low, close) if self.skip_idle_bars else None
+        trade_history, _, _ = _backtest_kernel(
+            df.index, high, low, close, self.initial_investment, self.unit_investment, self.max_buy_times,
+            self.buy_next_percent, self.sell_percent, self.record_trades, crossing_index, self.state
+        )
+        if trade_history is not None and len(trade_history):
+            # 봉 번호를 처음부터 센 번호로 바꿔 둡니다.
+            trade_history.bars += self.n_bars
+            self._trade_logs.append(trade_history)
+        self.n_bars += len(close)
+        self.last_close = close[-1]
+
+    def result(self):
+        """
+        지금까지 받은 봉 전체의 결과를 run_backtest와 같은 형식으로 반환합니다.
+        반환값:
+          - trade_history: 매매 내역 TradeLog (record_trades=False이면 None)
+          - final_value: 최종 포트폴리오 가치
+          - total_return: 총 수익률 (%)
+        """
+        if self.last_close is None:
+            raise ValueError("백테스트할 봉 데이터가 없습니다.")
+        trade_history = TradeLog.concat(self._trade_logs) if self.record_trades else None
+        final_value = self.state['cash'] + self.state['holdings'] * self.last_close
+        total_return = (final_value - self.initial_investment) / self.initial_investment * 100
+        return trade_history, final_value, total_return
+
+def expand_grid(buy_grid, sell_grid):
+    """
+    (매수 갭 %, 매도 %) 그리드를 행 우선(매수 갭 바깥, 매도 % 안쪽) 순서의 조합 배열로 펼칩니다.
+    """
+    buy_grid = np.asarray(buy_grid, dtype=np.float64)
+    sell_grid = np.asarray(sell_grid, dtype=np.float64)
+    return np.repeat(buy_grid, len(sell_grid)), np.tile(sell_grid, len(buy_grid))
+
+def returns_frame(total_return, buy_grid, sell_grid):
+    """
+    조합별 총 수익률 배열을 app.py의 피벗 테이블과 같은 모양의 DataFrame으로 만듭니다.
+    """
+    return pd.DataFrame(
+        np.asarray(total_return).reshape(len(buy_grid), len(sell_grid)),
+        index=pd.Index(np.asarray(buy_grid, dtype=np.float64), name='매수 갭 %'),
+        columns=pd.Index(np.asarray(sell_grid, dtype=np.float64), name='매도 %')
+    )
+
+def run_backtest_grid(df, initial_investment, unit_investment, max_buy_times, buy_grid, sell_grid, progress_callback=None,
+                      record_best=False, state=None):
+    """
+    모든 (매수 갭 %, 매도 %) 조합을 한 번의 봉 순회로 동시에 백테스트합니다.
+    조합마다 상태(현금, 보유 수량, 매수 차수 스택 등)를 배열의 한 칸으로 두고 봉 단위로 함께 진행하며,
+    각 조합의 결과는 run_backtest와 동일합니다.
+
+    Parameters:
+      df (DataFrame): 날짜별 OHLCV 데이터
+      buy_grid (array-like): 매수 갭 % 후보값
+      sell_grid (array-like): 매도 % 후보값
+      progress_callback (callable, optional): 진행률(0~1)을 받는 함수
+      record_best (bool): True이면 최고 수익 조합의 이벤트 배열도 함께 반환
+      state (dict, optional): new_grid_state 상태 (주면 df의 봉을 그 상태에 이어서 실행하고 제자리 갱신)
+
+    Returns:
+      DataFrame: 총 수익률 (%) 행렬 (인덱스 '매수 갭 %', 컬럼 '매도 %')
+      (record_best=True이면 (행렬, 최고 수익 조합의 이벤트 배열))
+    """
+    high, low, close = price_arrays(df)
+    buy_next_percent, sell_percent = expand_grid(buy_grid, sell_grid)
+    if not record_best:
+        total_return = backtest_grid_arrays(
+            high, low, close, initial_investment, unit_investment, max_buy_times,
+            buy_next_percent, sell_percent, progress_callback, state=state
+        )
+        return returns_frame(total_return, buy_grid, sell_grid)
+
+    total_return, events = backtest_grid_arrays(
+        high, low, close, initial_investment, unit_investment, max_buy_times,
+        buy_next_percent, sell_percent, progress_callback, record_events=True, state=state
+    )
+    _, best_events = best_cell_events(total_return, events)
+    return returns_frame(total_return, buy_grid, sell_grid), best_events
+
+def new_grid_state(n_cells, initial_investment, max_buy_times):
+    """
+    그리드 엔진의 시작 상태를 만듭니다. (조합마다 한 칸씩인 배열 dict)
+    backtest_grid_arrays에 넘기면 제자리에서 갱신되므로 저장해 두었다가 새 봉부터 이어서 실행할 수 있습니다.
+    """
+    return {
+        'cash': np.full(n_cells, float(initial_investment)),
+        'holdings': np.zeros(n_cells, dtype=np.int64),
+        'buy_count': np.zeros(n_cells, dtype=np.int64),
+        # 매수 차수 스택 (조합 x 차수별 매수가, 수량)
+        'level_prices': np.zeros((n_cells, max_buy_times)),
+        'level_shares': np.zeros((n_cells, max_buy_times), dtype=np.int64),
+        'waiting_for_initial_price': np.zeros(n_cells, dtype=bool),
+        'initial_buy_price': np.full(n_cells, np.nan),   # NaN = 아직 첫 매수 전
+    }
+
+def grid_total_return(state, last_close, initial_investment):
+    """ 그리드 상태를 마지막 종가로 평가한 조합별 총 수익률 (%) """
+    final_value = state['cash'] + state['holdings'] * last_close
+    return (final_value - initial_investment) / initial_investment * 100
+
+def backtest_grid_arrays(high, low, close, initial_investment, unit_investment, max_buy_times, buy_next_percent, sell_percent,
+                         progress_callback=None, record_events=False, state=None):
+    """
+    조합별 매수 갭 %/매도 % 배열을 받아 모든 조합을 함께 진행하고, 조합별 총 수익률 (%) 배열을 반환합니다.
+    record_events=True이면 모든 조합의 매매를 발생 순서대로 담은 EVENT_DTYPE 배열도 함께 반환합니다.
+    state(new_grid_state)를 주면 그 상태에서 이어서 진행하고, 끝난 시점의 상태로 제자리 갱신합니다.
+    """
+    n_cells = len(buy_next_percent)
+    cells = np.arange(n_cells)
+    buy_next_percent_decimal = np.asarray(buy_next_percent, dtype=np.float64) / 100
+    sell_percent_decimal = np.asarray(sell_percent, dtype=np.float64) / 100
+
+    if state is None:
+        state = new_grid_state(n_cells, initial_investment, max_buy_times)
+    cash = state['cash']
+    holdings = state['holdings']
+    buy_count = state['buy_count']
+    level_prices = state['level_prices']
+    level_shares = state['level_shares']
+    waiting_for_initial_price = state['waiting_for_initial_price']
+    initial_buy_price = state['initial_buy_price']
+    events = [] if record_events else None
+    bar = 0
+
+    def buy(mask, prices):
+        # 매수가 발생한 조합만 골라 주식 수를 한 번에 계산하고 스택에 쌓습니다.
+        idx = cells[mask]
+        prices = prices[mask] if np.ndim(prices) else np.full(len(idx), prices)
+        number_of_shares, total_cost, commission = calculate_number_of_shares_to_buy_array(cash[idx], unit_investment, prices)
+        filled = number_of_shares > 0
+        idx, prices = idx[filled], prices[filled]
+        number_of_shares = number_of_shares[filled]
+        holdings[idx] += number_of_shares
+        cash[idx] -= total_cost[filled] + commission[filled]
+        level = buy_count[idx]
+        level_prices[idx, level] = prices
+        level_shares[idx, level] = number_of_shares
+        buy_count[idx] = level + 1
+        if events is not None:
+            events.extend(zip(
+                idx.tolist(), [bar] * len(idx), [False] * len(idx), prices.tolist(),
+                number_of_shares.tolist(), holdings[idx].tolist(), cash[idx].tolist(), (level + 1).tolist()
+            ))
+        bought = np.zeros(n_cells, dtype=bool)
+        bought[idx] = True
+        return bought
+
+    n_bars = len(close)
+    for bar, (low_price, high_price, close_price) in enumerate(zip(low.tolist(), high.tolist(), close.tolist())):
+        for is_close, price in ((False, low_price), (False, high_price), (True, close_price)):
+            was_waiting = waiting_for_initial_price.copy()
+            has_cash = cash >= unit_investment
+
+            # 매도 후 초기 상태: 지정한 가격 이하에서 다시 매수 시작
+            rebuy = was_waiting & (initial_buy_price >= price) & has_cash
+            if rebuy.any():
+                bought = buy(rebuy, initial_buy_price)
+                waiting_for_initial_price[bought] = False
+
+            active = ~was_waiting & (buy_count > 0)
+
+            # 첫 매수는 종가에서만
+            if is_close:
+                first = ~was_waiting & (buy_count == 0) & has_cash
+                if first.any():
+                    bought = buy(first, price)
+                    initial_buy_price[bought] = price
+
+            if active.any():
+                # 추가 매수 조건
+                top = level_prices[cells, buy_count - 1]
+                target_buy_price = top * (1 - buy_next_percent_decimal)
+                add = active & (price <= target_buy_price) & (buy_count < max_buy_times) & has_cash
+                if add.any():
+                    buy(add, target_buy_price)
+                    top = level_prices[cells, buy_count - 1]
+
+                # 매도 조건
+                target_sell_price = top * (1 + sell_percent_decimal)
+                sell = active & (price >= target_sell_price)
+                if sell.any():
+                    idx = cells[sell]
+                    top_level = buy_count[idx] - 1
+                    number_of_shares_to_sell = level_shares[idx, top_level]
+                    net_proceeds, _, _ = calculate_proceeds_from_selling(number_of_shares_to_sell, target_sell_price[idx])
+                    holdings[idx] -= number_of_shares_to_sell
+                    cash[idx] += net_proceeds
+                    if events is not None:
+                        events.extend(zip(
+                            idx.tolist(), [bar] * len(idx), [True] * len(idx), target_sell_price[idx].tolist(),
+                            number_of_shares_to_sell.tolist(), holdings[idx].tolist(), cash[idx].tolist(), (top_level + 1).tolist()
+                        ))
+                    buy_count[idx] = top_level
+                    waiting_for_initial_price[idx[top_level == 0]] = True
+
+        if progress_callback is not None and (bar % 50 == 49 or bar == n_bars - 1):
+            progress_callback((bar + 1) / n_bars)
+
+    total_return = grid_total_return(state, close[-1], initial_investment)
+
+    if record_events:
+        return total_return, np.array(events, dtype=EVENT_DTYPE)
+    return total_return
+
+def best_cell_events(total_return, events):
+    """
+    총 수익률이 가장 높은 조합(동률이면 앞 조합)의 번호와 그 조합의 이벤트만 골라 반환합니다.
+    """
+    best = int(np.argmax(total_return))
+    return best, events[events['cell'] == best]
+
 # strategy.py (추가 함수)
 def compute_portfolio_history(df, trade_history, initial_investment):
     """
     trade_history의 거래 내역과 df (날짜별 종가)를 기반으로 포트폴리오 가치를 기록합니다.
+    각 날짜에는 그날까지의 마지막 거래 후 현금/보유 수량을 종가로 평가합니다.
     
     Parameters:
       df (DataFrame): 날짜별 OHLCV 데이터 (인덱스는 datetime)
-      trade_history (list): 각 거래 이벤트를 담은 리스트 (각 항목은 dict)
+      trade_history (TradeLog): df로 실행한 백테스트의 매매 내역
       initial_investment (int): 초기 투자 금액
       
     Returns:
       dates (list): 날짜 리스트
       portfolio_values (list): 각 날짜의 포트폴리오 가치 (cash + holdings * 종가)
     """
-    # 거래 내역을 날짜 순으로 정렬
-    trade_history_sorted = sorted(trade_history, key=lambda x: x['Date'])
-    
-    portfolio_values = []
-    cash = initial_investment
-    holdings = 0
-    trade_idx = 0
-    trades_len = len(trade_history_sorted)
-    
-    # df의 각 날짜별로 거래 내역 업데이트 반영
-    for date, row in df.iterrows():
-        # 해당 날짜에 발생한 모든 거래 처리
-        while trade_idx < trades_len and trade_history_sorted[trade_idx]['Date'] == date:
-            trade = trade_history_sorted[trade_idx]
-            cash = trade['Cash']       # 거래 후 cash 값 업데이트
-            holdings = trade['Holdings']  # 거래 후 holdings 값 업데이트
-            trade_idx += 1
-        # 해당 날짜 종가 기준 포트폴리오 가치 계산
-        portfolio_value = cash + holdings * row['종가']
-        portfolio_values.append(portfolio_value)
-        
-    return list(df.index), portfolio_values
\ No newline at end of file
+    close = df['종가'].to_numpy(dtype=np.float64)
+    # 봉마다 그 봉까지의 마지막 거래 위치 (-1이면 아직 거래 없음)
+    last = np.searchsorted(trade_history.bars, np.arange(len(close)), side='right') - 1
+    traded = last >= 0
+    cash = np.where(traded, trade_history.cash[last], float(initial_investment))
+    holdings = np.where(traded, trade_history.holdings[last], 0)
+    return list(df.index), (cash + holdings * close).tolist()
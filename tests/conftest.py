@@ -0,0 +1,6 @@
+# tests/conftest.py
+# 저장소 루트의 모듈(strategy, stock_api 등)을 테스트에서 바로 import할 수 있게 합니다.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
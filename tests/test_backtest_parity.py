@@ -0,0 +1,173 @@
+# tests/test_backtest_parity.py
+# 백테스트 엔진들(배열 커널, 그리드, 건너뛰기, 스트리밍, 체크포인트 재개)이
+# 예전 iterrows 구현과 같은 매매 내역/최종 가치/수익률을 내는지 확인합니다.
+import numpy as np
+import pandas as pd
+import pytest
+
+import legacy_strategy
+from checkpoint import GridCheckpointStore
+from optimizer import _resume_grid, optimize_grid
+from strategy import (
+    StreamingBacktest, backtest_grid_arrays, best_cell_events, compute_portfolio_history, expand_grid,
+    run_backtest, run_backtest_event_driven, run_backtest_grid
+)
+from trade_log import TradeLog
+
+# (시드, 시작 가격, 정수 가격 여부)
+CASES = [
+    (0, 100, True),
+    (1, 10_000, False),
+    (2, 250_000, True),
+    (3, 10_000, True),
+    (4, 3_000, False),
+]
+BUY_GRID = [1.0, 2.5, 4.0, 7.5]
+SELL_GRID = [1.5, 3.0, 6.0]
+
+
+def make_ohlc(n_bars, seed, start_price, integer_prices):
+    """ 로그 정규 랜덤 워크로 고가 >= 시가/종가 >= 저가인 일봉 데이터를 만듭니다. """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.03, n_bars)))
+    open_ = close * np.exp(rng.normal(0, 0.01, n_bars))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.015, n_bars)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.015, n_bars)))
+    if integer_prices:
+        open_, high, low, close = (np.round(values).astype(np.int64) for values in (open_, high, low, close))
+    return pd.DataFrame(
+        {'시가': open_, '고가': high, '저가': low, '종가': close, '거래량': rng.integers(1_000, 1_000_000, n_bars)},
+        index=pd.bdate_range('2015-01-01', periods=n_bars, name='날짜')
+    )
+
+
+def normalize(trade_history):
+    return [
+        (trade['Date'], trade['Type'], float(trade['Price']), int(trade['Holdings']), float(trade['Cash']),
+         int(trade['Buy_Count']), int(trade['Shares']))
+        for trade in trade_history
+    ]
+
+
+def random_params(rng):
+    """ (매수 갭 %, 매도 %, 최대 매수 차수, 1회 투자 금액)을 임의로 고릅니다. """
+    return (
+        rng.choice(np.arange(1.0, 10.5, 0.5)), rng.choice(np.arange(1.0, 10.5, 0.5)),
+        int(rng.integers(1, 12)), int(rng.choice([300_000, 500_000, 1_000_000])),
+    )
+
+
+@pytest.mark.parametrize("seed, start_price, integer_prices", CASES)
+def test_run_backtest_matches_iterrows_implementation(seed, start_price, integer_prices):
+    df = make_ohlc(300, seed, start_price, integer_prices)
+    rng = np.random.default_rng(seed + 100)
+    for _ in range(40):
+        buy_next_percent, sell_percent, max_buy_times, unit_investment = random_params(rng)
+        args = (df, 5_000_000, unit_investment, max_buy_times, buy_next_percent, sell_percent)
+
+        expected_history, expected_value, expected_return = legacy_strategy.run_backtest(*args)
+        trade_history, final_value, total_return = run_backtest(*args)
+
+        assert normalize(trade_history.to_dicts()) == normalize(expected_history)
+        assert final_value == expected_value
+        assert total_return == expected_return
+
+
+@pytest.mark.parametrize("seed, start_price, integer_prices", CASES)
+def test_grid_matches_iterrows_implementation(seed, start_price, integer_prices):
+    df = make_ohlc(250, seed, start_price, integer_prices)
+    high, low, close = (df[col].to_numpy(dtype=np.float64) for col in ('고가', '저가', '종가'))
+    buy_next_percent, sell_percent = expand_grid(BUY_GRID, SELL_GRID)
+    max_buy_times = 3 + seed
+
+    total_return, events = backtest_grid_arrays(
+        high, low, close, 5_000_000, 500_000, max_buy_times, buy_next_percent, sell_percent, record_events=True
+    )
+    returns = run_backtest_grid(df, 5_000_000, 500_000, max_buy_times, BUY_GRID, SELL_GRID)
+    np.testing.assert_array_equal(returns.to_numpy().ravel(), total_return)
+
+    # 조합마다 총 수익률과 그 조합의 이벤트로 만든 매매 내역이 iterrows 구현과 같아야 합니다.
+    for cell, (buy, sell) in enumerate(zip(buy_next_percent, sell_percent)):
+        expected_history, _, expected_return = legacy_strategy.run_backtest(
+            df, 5_000_000, 500_000, max_buy_times, buy, sell
+        )
+        assert returns.loc[buy, sell] == expected_return
+        history = TradeLog.from_events(df.index, events[events['cell'] == cell])
+        assert normalize(history.to_dicts()) == normalize(expected_history)
+
+    best, best_events = best_cell_events(total_return, events)
+    assert best == int(np.argmax(total_return))
+    _, recorded_best = run_backtest_grid(df, 5_000_000, 500_000, max_buy_times, BUY_GRID, SELL_GRID, record_best=True)
+    np.testing.assert_array_equal(recorded_best, best_events)
+    expected_history, _, _ = legacy_strategy.run_backtest(
+        df, 5_000_000, 500_000, max_buy_times, buy_next_percent[best], sell_percent[best]
+    )
+    assert normalize(TradeLog.from_events(df.index, best_events).to_dicts()) == normalize(expected_history)
+
+
+@pytest.mark.parametrize("seed, start_price, integer_prices", CASES)
+def test_event_driven_and_streaming_match_iterrows_implementation(seed, start_price, integer_prices):
+    df = make_ohlc(300, seed, start_price, integer_prices)
+    rng = np.random.default_rng(seed + 200)
+    for _ in range(10):
+        buy_next_percent, sell_percent, max_buy_times, unit_investment = random_params(rng)
+        args = (5_000_000, unit_investment, max_buy_times, buy_next_percent, sell_percent)
+        expected_history, expected_value, expected_return = legacy_strategy.run_backtest(df, *args)
+
+        trade_history, final_value, total_return = run_backtest_event_driven(df, *args)
+        assert normalize(trade_history.to_dicts()) == normalize(expected_history)
+        assert (final_value, total_return) == (expected_value, expected_return)
+
+        # 임의의 자리에서 나눈 조각을 차례로 넣어도 한 번에 실행한 것과 같아야 합니다.
+        cuts = np.sort(rng.choice(np.arange(1, len(df)), size=5, replace=False))
+        for skip_idle_bars in (False, True):
+            stream = StreamingBacktest(*args, skip_idle_bars=skip_idle_bars)
+            for part in np.split(np.arange(len(df)), cuts):
+                stream.feed(df.iloc[part])
+            trade_history, final_value, total_return = stream.result()
+            assert normalize(trade_history.to_dicts()) == normalize(expected_history)
+            assert (final_value, total_return) == (expected_value, expected_return)
+
+
+@pytest.mark.parametrize("seed, start_price, integer_prices", CASES)
+def test_streaming_equity_matches_iterrows_bar_by_bar(seed, start_price, integer_prices):
+    df = make_ohlc(60, seed, start_price, integer_prices)
+    buy_next_percent, sell_percent, max_buy_times, unit_investment = random_params(np.random.default_rng(seed + 300))
+    args = (5_000_000, unit_investment, max_buy_times, buy_next_percent, sell_percent)
+
+    # 전략은 앞의 봉만 보므로, 앞쪽 n개 봉으로 실행한 iterrows 구현의 최종 가치가 n번째 봉의 평가액입니다.
+    stream = StreamingBacktest(*args, skip_idle_bars=True)
+    equity = []
+    for bar in range(len(df)):
+        stream.feed(df.iloc[bar:bar + 1])
+        _, final_value, _ = stream.result()
+        _, expected_value, _ = legacy_strategy.run_backtest(df.iloc[:bar + 1], *args)
+        assert final_value == expected_value, bar
+        equity.append(final_value)
+
+    trade_history, _, _ = stream.result()
+    _, portfolio_values = compute_portfolio_history(df, trade_history, 5_000_000)
+    assert portfolio_values == equity
+
+
+@pytest.mark.parametrize("seed, start_price, integer_prices", CASES)
+def test_checkpoint_resume_matches_single_pass(tmp_path, seed, start_price, integer_prices):
+    df = make_ohlc(250, seed, start_price, integer_prices)
+    store = GridCheckpointStore(str(tmp_path))
+    expected = run_backtest_grid(df, 5_000_000, 500_000, 4, BUY_GRID, SELL_GRID)
+
+    # 앞쪽 봉으로 체크포인트를 남긴 뒤, 봉이 늘어난 데이터로 이어서 실행합니다.
+    for n_bars in (90, 170):
+        _resume_grid(df.iloc[:n_bars], 5_000_000, 500_000, 4, BUY_GRID, SELL_GRID, "parity", store)
+    returns, best_events = _resume_grid(df, 5_000_000, 500_000, 4, BUY_GRID, SELL_GRID, "parity", store)
+    pd.testing.assert_frame_equal(returns, expected)
+    assert best_events is None
+
+    # 이어서 실행한 결과의 최적 조합 매매 내역도 iterrows 구현과 같아야 합니다.
+    result = optimize_grid(df, 5_000_000, 500_000, 4, BUY_GRID, SELL_GRID, checkpoint_id="parity", checkpoint_store=store)
+    expected_history, expected_value, expected_return = legacy_strategy.run_backtest(
+        df, 5_000_000, 500_000, 4, result['optimal_buy_next_percent'], result['optimal_sell_percent']
+    )
+    assert result['max_return'] == expected_return == expected.to_numpy().max()
+    assert normalize(result['trade_history'].to_dicts()) == normalize(expected_history)
+    assert result['final_value'] == expected_value
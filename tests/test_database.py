@@ -0,0 +1,238 @@
+# tests/test_database.py
+# 공유 Supabase 클라이언트와 결과 저장 큐를 테스트 더블 클라이언트(set_client_factory)로 확인합니다.
+import json
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+import database
+
+
+class FakeServer:
+    """ 여러 클라이언트가 함께 쓰는 대역 테이블 (insert된 행과 요청 수를 기록) """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []
+        self.inserts = 0
+        self.probes = 0
+        self.insert_errors = []     # insert 때마다 앞에서부터 하나씩 꺼내 던질 예외
+        self.down = False           # True이면 모든 insert가 ConnectError로 실패
+        self.gate = None            # threading.Event를 넣으면 insert가 set()될 때까지 멈춤
+        self.insert_started = threading.Event()
+        self.clients = []
+
+
+class FakeQuery:
+    def __init__(self, client, kind, data=None):
+        self.client = client
+        self.kind = kind
+        self.data = data
+
+    def select(self, *args):
+        return FakeQuery(self.client, "select")
+
+    def insert(self, data):
+        return FakeQuery(self.client, "insert", data)
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def execute(self):
+        server = self.client.server
+        if self.kind == "select":
+            with server.lock:
+                server.probes += 1
+            if not self.client.healthy:
+                raise httpx.ConnectError("연결 끊김")
+            return None
+        if server.gate is not None:
+            server.insert_started.set()
+            server.gate.wait()
+        with server.lock:
+            server.inserts += 1
+            if server.down:
+                raise httpx.ConnectError("서버 다운")
+            error = server.insert_errors.pop(0) if server.insert_errors else None
+            if error is not None and not isinstance(error, httpx.RemoteProtocolError):
+                raise error
+            # RemoteProtocolError는 서버가 행을 이미 저장한 뒤 응답이 끊긴 경우를 흉내 냅니다.
+            server.rows.extend(self.data if isinstance(self.data, list) else [self.data])
+        if error is not None:
+            raise error
+        return None
+
+
+class FakeClient:
+    def __init__(self, server):
+        self.server = server
+        self.healthy = True
+
+    def table(self, name):
+        return FakeQuery(self, "table")
+
+
+@pytest.fixture
+def server():
+    server = FakeServer()
+
+    def factory(url, key):
+        client = FakeClient(server)
+        server.clients.append(client)
+        return client
+
+    database.set_client_factory(factory)
+    yield server
+    database.set_client_factory(database.create_client)
+
+
+def test_client_is_reused_across_calls(server):
+    first = database.get_supabase_client()
+    assert database.get_supabase_client() is first
+    database.insert_backtest_result({"id": 1})
+    database.insert_backtest_result({"id": 2})
+    assert len(server.clients) == 1
+    # 상태 확인 주기 전에는 확인 요청도 보내지 않습니다.
+    assert server.probes == 0
+
+
+def test_failed_health_check_replaces_client(server, monkeypatch):
+    first = database.get_supabase_client()
+    monkeypatch.setattr(database, "SUPABASE_HEALTHCHECK_INTERVAL", -1)
+
+    # 응답하는 클라이언트는 확인 후에도 그대로 씁니다.
+    assert database.get_supabase_client() is first
+    assert server.probes == 1
+
+    first.healthy = False
+    second = database.get_supabase_client()
+    assert second is not first
+    assert len(server.clients) == 2
+    assert database.get_supabase_client() is second
+
+
+def test_connect_error_reconnects_and_retries_once(server):
+    database.get_supabase_client()
+    server.insert_errors = [httpx.ConnectError("연결 실패")]
+    database.insert_backtest_result({"id": 1})
+    assert server.inserts == 2
+    assert len(server.clients) == 2
+    assert server.rows == [{"id": 1}]
+
+    # 다시 시도해도 실패하면 한 번만 더 보내고 예외를 그대로 올립니다.
+    server.insert_errors = [httpx.ConnectError("연결 실패"), httpx.ConnectError("연결 실패")]
+    with pytest.raises(httpx.ConnectError):
+        database.insert_backtest_result({"id": 2})
+    assert server.inserts == 4
+
+
+def test_remote_protocol_error_does_not_resend_insert(server):
+    database.get_supabase_client()
+    server.insert_errors = [httpx.RemoteProtocolError("응답 중 연결 끊김")]
+    with pytest.raises(httpx.RemoteProtocolError):
+        database.insert_backtest_result({"id": 1})
+    assert server.inserts == 1
+    assert server.rows == [{"id": 1}]
+    assert len(server.clients) == 1
+
+
+def make_writer(tmp_path, **kwargs):
+    options = {"batch_size": 10, "flush_interval": 0.01, "max_retries": 2, "backoff": 0}
+    options.update(kwargs)
+    return database.BacktestResultWriter(str(tmp_path / "journal.jsonl"), **options)
+
+
+def read_journal(writer):
+    """ 저널을 줄 단위로 읽습니다. (줄이 섞여 깨졌으면 json.loads가 실패) """
+    if not os.path.exists(writer.journal_path):
+        return []
+    with open(writer.journal_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "시간 안에 조건을 만족하지 못했습니다"
+        time.sleep(0.01)
+
+
+def test_failed_batch_goes_to_journal_and_is_replayed_after_recovery(server, tmp_path):
+    server.down = True
+    writer = make_writer(tmp_path)
+    rows = [{"id": i} for i in range(3)]
+    for row in rows:
+        writer.submit(row)
+    assert writer.flush(5)
+    assert read_journal(writer) == rows
+    assert server.rows == []
+
+    # 다음 저장이 성공하면 저널의 행도 보내고 저널을 지웁니다.
+    server.down = False
+    writer.submit({"id": 3})
+    assert writer.flush(5)
+    assert not os.path.exists(writer.journal_path)
+    assert sorted(row["id"] for row in server.rows) == [0, 1, 2, 3]
+
+
+def test_new_writer_replays_journal_and_removes_it(server, tmp_path):
+    server.down = True
+    first = make_writer(tmp_path)
+    rows = [{"id": i} for i in range(5)]
+    for row in rows:
+        first.submit(row)
+    assert first.flush(5)
+    assert read_journal(first) == rows
+
+    server.down = False
+    second = make_writer(tmp_path, batch_size=2)
+    wait_until(lambda: not os.path.exists(second.journal_path))
+    assert server.rows == rows
+
+
+@pytest.mark.parametrize("insert_succeeds", [True, False])
+def test_close_during_in_flight_batch_keeps_every_row_once(server, tmp_path, insert_succeeds):
+    server.gate = threading.Event()
+    writer = make_writer(tmp_path, batch_size=2)
+    for i in range(5):
+        writer.submit({"id": i})
+    assert server.insert_started.wait(5)
+
+    # 보내는 중인 묶음과 큐에 남은 행은 모두 저널로 옮겨집니다.
+    writer.close(timeout=0.05)
+    assert sorted(row["id"] for row in read_journal(writer)) == [0, 1, 2, 3, 4]
+
+    # 멈춰 있던 insert가 끝난 뒤에도 각 행은 DB 또는 저널 중 한 곳에만 남습니다.
+    server.down = not insert_succeeds
+    server.gate.set()
+    assert writer.flush(5)
+    assert bool(server.rows) == insert_succeeds
+    assert sorted(row["id"] for row in server.rows + read_journal(writer)) == [0, 1, 2, 3, 4]
+
+
+def test_concurrent_journal_appends_do_not_interleave(server, tmp_path):
+    server.down = True
+    writer = make_writer(tmp_path, batch_size=1, max_retries=1)
+    # 한 번의 write로 끝나지 않을 만큼 긴 행을 여러 스레드가 넣는 동안 close()도 저널에 덧붙입니다.
+    payload = "가" * 50_000
+    submitters = [
+        threading.Thread(target=lambda start=start: [writer.submit({"id": i, "payload": payload}) for i in range(start, start + 10)])
+        for start in range(0, 40, 10)
+    ]
+    for thread in submitters:
+        thread.start()
+    wait_until(lambda: os.path.exists(writer.journal_path))
+    writer.close(timeout=0)
+    for thread in submitters:
+        thread.join()
+    assert writer.flush(5)
+
+    journal = read_journal(writer)
+    assert all(row["payload"] == payload for row in journal)
+    assert sorted(row["id"] for row in journal) == list(range(40))
@@ -0,0 +1,56 @@
+# tests/test_share_sizing.py
+# 닫힌 식으로 계산하는 매수 주식 수(스칼라/배열)가 예전 반복 감소 구현과 같은지 확인합니다.
+import numpy as np
+import pytest
+
+import legacy_strategy
+from strategy import calculate_number_of_shares_to_buy, calculate_number_of_shares_to_buy_array
+
+COMMISSION_RATES = [0.0, 0.00015, 0.0003, 0.001, 0.015, 0.1, 1 / 3]
+UNIT_INVESTMENTS = [1_000_000, 333_333, 10 ** 9]
+
+
+def boundary_cases(commission_rate, seed):
+    """
+    가격 * 주식 수 * (1 + 수수료율)이 현금과 딱 맞는 경계값과 그 바로 위/아래 한 ulp,
+    그리고 임의의 현금을 섞은 (현금, 가격) 배열을 만듭니다.
+    """
+    rng = np.random.default_rng(seed)
+    prices = np.concatenate([
+        rng.uniform(1, 500_000, 300),
+        np.round(rng.uniform(10, 100_000, 300), -1),  # 호가 단위처럼 10원 단위
+        rng.uniform(0.01, 5, 100),
+    ])
+    shares = rng.integers(1, 5_000, len(prices))
+    half = len(prices) // 2
+    cash = np.concatenate([
+        prices[:half] * shares[:half] * (1 + commission_rate),
+        rng.uniform(0, 1e8, len(prices) - half),
+    ])
+    cash = np.concatenate([cash, np.nextafter(cash, 0), np.nextafter(cash, np.inf)])
+    return cash, np.tile(prices, 3)
+
+
+def same_result(actual, expected):
+    return tuple(actual) == tuple(expected) and all(type(a) is type(e) for a, e in zip(actual, expected))
+
+
+@pytest.mark.parametrize("commission_rate", COMMISSION_RATES)
+@pytest.mark.parametrize("unit_investment", UNIT_INVESTMENTS)
+def test_closed_form_matches_loop(commission_rate, unit_investment):
+    cash, prices = boundary_cases(commission_rate, seed=COMMISSION_RATES.index(commission_rate))
+    shares, total_cost, commission = calculate_number_of_shares_to_buy_array(cash, unit_investment, prices, commission_rate)
+    for i in range(len(cash)):
+        expected = legacy_strategy.calculate_number_of_shares_to_buy(
+            cash[i].item(), unit_investment, prices[i].item(), commission_rate
+        )
+        actual = calculate_number_of_shares_to_buy(cash[i].item(), unit_investment, prices[i].item(), commission_rate)
+        assert same_result(actual, expected), (cash[i], prices[i], actual, expected)
+        assert (shares[i], total_cost[i], commission[i]) == (expected[0], float(expected[1]), float(expected[2]))
+
+
+def test_integer_cash_matches_loop():
+    for cash in range(0, 20_000, 7):
+        for price in (1, 3, 7, 99, 1234.5):
+            expected = legacy_strategy.calculate_number_of_shares_to_buy(cash, 1_000, price)
+            assert same_result(calculate_number_of_shares_to_buy(cash, 1_000, price), expected), (cash, price)
@@ -0,0 +1,222 @@
+# tests/test_stock_api_aio.py
+# 로컬 대역 KRX 서버를 띄워 stock_api_aio의 비동기 조회가 stock_api 동기 조회와 같은 결과를 내는지 확인합니다.
+import asyncio
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import range_fetcher
+import stock_api
+import stock_api_aio
+import trading_calendar
+from pykrx.website.comm import webio
+from pykrx.website.krx.etx.ticker import EtxTicker
+from pykrx.website.krx.market.ticker import StockTicker
+
+KRX_URL = "https://data.krx.co.kr"
+
+# (티커, 종목명, ISIN, 시장 코드, 시장 이름)
+STOCKS = [
+    ("005930", "삼성전자", "KR7005930003", "STK", "유가증권"),
+    ("035720", "카카오", "KR7035720002", "STK", "유가증권"),
+    ("091990", "셀트리온헬스케어", "KR7091990002", "KSQ", "코스닥"),
+]
+# 상장 폐지 종목 (티커, 종목명, ISIN, 시장 코드, 시장 이름)
+DELISTED = [("000010", "폐지종목", "KR7000010009", "STK", "유가증권")]
+# (ISIN, 티커, 종목명, 상장일)
+ETFS = [
+    ("KR7069500007", "069500", "KODEX 200", "2002/10/14"),
+    ("KR7102110004", "102110", "TIGER 200", "2008/04/03"),
+    ("KR7360750004", "360750", "TIGER 미국S&P500", "2020/08/07"),
+]
+ETNS = [("KRG580000112", "580011", "KB FnGuide 언택트 ETN", "2020/09/01")]
+ELWS = [("KRA5811AJA22", "58F194", "KBF194SK하이닉콜", "2020/02/26")]
+ETX_BLDS = {
+    "dbms/MDC/STAT/standard/MDCSTAT04601": ETFS,
+    "dbms/MDC/STAT/standard/MDCSTAT06701": ETNS,
+    "dbms/MDC/STAT/standard/MDCSTAT08501": ELWS,
+}
+
+
+def fake_price(ticker, day):
+    return 1000 + int(ticker) % 977 + day.dayofyear * 7 % 113
+
+
+def fake_response(params):
+    """ bld별로 KRX 응답 형식을 흉내 낸 JSON을 만듭니다. """
+    bld = params.get("bld", "")
+    if bld in ("dbms/comm/finder/finder_stkisu", "dbms/comm/finder/finder_listdelisu"):
+        stocks = STOCKS if bld.endswith("stkisu") else DELISTED
+        return {"block1": [
+            dict(full_code=isin, short_code=ticker, codeName=name, marketCode=market, marketName=market_name)
+            for ticker, name, isin, market, market_name in stocks
+        ]}
+    if bld == "dbms/MDC/STAT/standard/MDCSTAT01701":
+        ticker = next(ticker for ticker, _, isin, _, _ in STOCKS if isin == params["isuCd"])
+        days = pd.bdate_range(params["strtDd"], params["endDd"])[::-1]
+        return {"output": [
+            dict(
+                TRD_DD=day.strftime("%Y/%m/%d"), TDD_CLSPRC=f"{fake_price(ticker, day):,}", FLUC_TP_CD="1",
+                CMPPREVDD_PRC="0", FLUC_RT="0.50", TDD_OPNPRC=f"{fake_price(ticker, day) - 5:,}",
+                TDD_HGPRC=f"{fake_price(ticker, day) + 9:,}", TDD_LWPRC=f"{fake_price(ticker, day) - 9:,}",
+                ACC_TRDVOL="1,000", ACC_TRDVAL="1,000,000", MKTCAP="5,000,000", LIST_SHRS="5,000"
+            )
+            for day in days
+        ]}
+    if bld == "dbms/MDC/STAT/standard/MDCSTAT01501":
+        day = pd.Timestamp(params["trdDd"])
+        return {"OutBlock_1": [
+            dict(
+                ISU_SRT_CD=ticker, ISU_ABBRV=name, MKT_NM="KOSPI", SECT_TP_NM="",
+                TDD_CLSPRC=f"{fake_price(ticker, day):,}", FLUC_TP_CD="1", CMPPREVDD_PRC="1", FLUC_RT="0.1",
+                TDD_OPNPRC="1", TDD_HGPRC="1", TDD_LWPRC="1", ACC_TRDVOL="10", ACC_TRDVAL="1,000",
+                MKTCAP=f"{fake_price(ticker, day) * 1000:,}", LIST_SHRS="1,000", MKT_ID=market
+            )
+            for ticker, name, _, market, _ in STOCKS
+        ]}
+    if bld in ETX_BLDS:
+        return {"output": [
+            dict(ISU_CD=isin, ISU_SRT_CD=ticker, ISU_ABBRV=name, LIST_DD=listed)
+            for isin, ticker, name, listed in ETX_BLDS[bld]
+        ]}
+    return {"output": []}
+
+
+class FakeKrxHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        params = {key: values[0] for key, values in urllib.parse.parse_qs(body, keep_blank_values=True).items()}
+        self.hits.append(params.get("bld"))
+        data = json.dumps(fake_response(params)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture(scope="module")
+def fake_krx():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeKrxHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def krx(fake_krx, monkeypatch):
+    """
+    동기 조회(requests)와 비동기 조회(stock_api_aio)가 모두 대역 서버로 가게 합니다.
+    요청 제한은 풀고, 영업일 달력은 평일 달력으로 바꿉니다.
+    """
+    original_request = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        if url.startswith(KRX_URL):
+            url = fake_krx + url[len(KRX_URL):]
+        return original_request(self, method, url, *args, **kwargs)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    monkeypatch.setattr(stock_api_aio, "AIO_KRX_URL", fake_krx)
+    monkeypatch.setattr(range_fetcher, "_krx_rate_limiter", range_fetcher.TokenBucket(1000, 1000))
+
+    def weekdays(start, end):
+        days = np.arange(start, end + np.timedelta64(1, "D"), dtype="M8[D]")
+        return days[np.is_busday(days)]
+
+    monkeypatch.setattr(trading_calendar, "_trading_calendar", trading_calendar.TradingCalendar(fetch=weekdays))
+    FakeKrxHandler.hits.clear()
+    return FakeKrxHandler.hits
+
+
+def run_async(*coroutines):
+    """ 한 이벤트 루프에서 조회를 동시에 실행하고, 끝나면 공유 세션을 닫습니다. """
+    async def main():
+        try:
+            return await asyncio.gather(*coroutines)
+        finally:
+            await stock_api_aio.close_session()
+    return asyncio.run(main())
+
+
+def forbid_sync_requests(monkeypatch):
+    """ 비동기 조회가 동기 requests 경로로 새지 않았는지 확인하기 위해 막아 둡니다. """
+    def request(self, method, url, *args, **kwargs):
+        raise AssertionError(f"동기 요청이 발생했습니다: {method} {url}")
+    monkeypatch.setattr(requests.Session, "request", request)
+
+
+def reset_ticker_singletons(monkeypatch):
+    """ pykrx가 메모리에 보관하는 종목 목록을 비워 비동기 쪽이 직접 받아 오게 합니다. """
+    monkeypatch.setattr(StockTicker, "_instance", None)
+    monkeypatch.setattr(EtxTicker, "_instance", None)
+
+
+def test_market_ohlcv_by_date_over_chunked_range(krx, monkeypatch):
+    # 2010~2023년은 FETCH_CHUNK_DAYS 구간 여러 개로 나뉩니다.
+    expected = stock_api.get_market_ohlcv_by_date("20100101", "20231231", "005930", adjusted=False)
+    expected_monthly = stock_api.get_market_ohlcv_by_date("20150101", "20231231", "035720", freq="m", adjusted=False)
+    sync_chunks = krx.count("dbms/MDC/STAT/standard/MDCSTAT01701")
+    krx.clear()
+
+    reset_ticker_singletons(monkeypatch)
+    forbid_sync_requests(monkeypatch)
+    daily, monthly = run_async(
+        stock_api_aio.get_market_ohlcv_by_date("20100101", "20231231", "005930", adjusted=False),
+        stock_api_aio.get_market_ohlcv_by_date("20150101", "20231231", "035720", freq="m", adjusted=False),
+    )
+
+    assert len(range_fetcher.split_date_range("20100101", "20231231")) > 1
+    pd.testing.assert_frame_equal(daily, expected)
+    pd.testing.assert_frame_equal(monthly, expected_monthly)
+    assert daily.index.is_monotonic_increasing
+    # 구간 요청은 동기 조회와 같은 수만큼 비동기 세션으로 나갑니다.
+    assert krx.count("dbms/MDC/STAT/standard/MDCSTAT01701") == sync_chunks
+
+
+def test_market_cap_by_ticker_on_holiday(krx, monkeypatch):
+    # 20240106은 토요일이므로 alternative=True이면 직전 영업일(20240105)로 조회합니다.
+    expected = stock_api.get_market_cap_by_ticker("20240106", alternative=True)
+    krx.clear()
+
+    forbid_sync_requests(monkeypatch)
+    (result,) = run_async(stock_api_aio.get_market_cap_by_ticker("20240106", alternative=True))
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.loc["005930", "종가"] == fake_price("005930", pd.Timestamp("20240105"))
+    assert krx == ["dbms/MDC/STAT/standard/MDCSTAT01501"]
+
+
+def test_etf_ticker_and_name(krx, monkeypatch):
+    expected = stock_api.get_etf_ticker_and_name("20240105")
+    krx.clear()
+
+    reset_ticker_singletons(monkeypatch)
+    forbid_sync_requests(monkeypatch)
+    (result,) = run_async(stock_api_aio.get_etf_ticker_and_name("20240105"))
+
+    assert result == expected == {ticker: name for _, ticker, name, _ in ETFS}
+    assert "dbms/MDC/STAT/standard/MDCSTAT04601" in krx
+
+
+def test_sync_reads_are_left_untouched(krx, monkeypatch):
+    # import만 해서는 pykrx의 read를 바꾸지 않고, 비동기 조회가 끝나면 원래 read로 되돌립니다.
+    original_reads = (webio.Get.read, webio.Post.read)
+    assert webio.Post.read.__qualname__ == "Post.read"
+
+    forbid_sync_requests(monkeypatch)
+    run_async(stock_api_aio.get_market_cap_by_ticker("20240105"))
+    assert (webio.Get.read, webio.Post.read) == original_reads
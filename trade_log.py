@@ -0,0 +1,113 @@
+# trade_log.py
+# 매매 내역을 컬럼별 NumPy 배열로 보관하는 거래 기록
+import numpy as np
+import pandas as pd
+
+# 백테스트 엔진이 기록하는 매매 이벤트 한 건
+EVENT_DTYPE = np.dtype([
+    ('cell', np.int64),       # 조합 번호 (expand_grid 순서, 단일 백테스트는 0)
+    ('bar', np.int64),        # 봉 번호
+    ('is_sell', np.bool_),    # False: 매수, True: 매도
+    ('price', np.float64),
+    ('shares', np.int64),
+    ('holdings', np.int64),   # 거래 후 보유 수량
+    ('cash', np.float64),     # 거래 후 현금
+    ('buy_count', np.int64),
+])
+
+# 매매 구분 코드 (types 배열 값)
+BUY, SELL = 0, 1
+TYPE_NAMES = ['Buy', 'Sell']
+
+
+class TradeLog:
+    """
+    한 백테스트의 매매 내역을 컬럼별 배열로 보관합니다. (거래 순서대로)
+    매매 구분(types)과 매수 차수(buy_counts)는 작은 정수로 저장하고,
+    to_frame()은 배열을 복사하지 않고 DataFrame으로 감쌉니다.
+    """
+
+    def __init__(self, dates, bars, types, prices, holdings, cash, buy_counts, shares):
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.bars = np.asarray(bars, dtype=np.int64)
+        self.types = np.asarray(types, dtype=np.int8)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.holdings = np.asarray(holdings, dtype=np.int64)
+        self.cash = np.asarray(cash, dtype=np.float64)
+        self.buy_counts = np.asarray(buy_counts, dtype=np.int16)
+        self.shares = np.asarray(shares, dtype=np.int64)
+
+    @classmethod
+    def from_events(cls, dates, events):
+        """
+        한 조합의 이벤트 배열(EVENT_DTYPE)로 거래 기록을 만듭니다.
+
+        Parameters:
+          dates (DatetimeIndex): 백테스트한 데이터의 날짜 (봉 번호 -> 날짜)
+          events (ndarray): 거래 순서대로 정렬된 EVENT_DTYPE 배열
+        """
+        bars = events['bar']
+        return cls(
+            np.asarray(dates, dtype='datetime64[ns]')[bars], bars, events['is_sell'].astype(np.int8),
+            events['price'], events['holdings'], events['cash'], events['buy_count'], events['shares']
+        )
+
+    @classmethod
+    def concat(cls, logs):
+        """ 시간 순서대로 이어지는 여러 거래 기록을 하나로 합칩니다. """
+        logs = list(logs)
+        return cls(*(
+            np.concatenate([getattr(log, name) for log in logs]) if logs else []
+            for name in ('dates', 'bars', 'types', 'prices', 'holdings', 'cash', 'buy_counts', 'shares')
+        ))
+
+    def __len__(self):
+        return len(self.bars)
+
+    def __getitem__(self, key):
+        """ 불리언 마스크/인덱스로 일부 거래만 골라 새 TradeLog를 반환합니다. """
+        return TradeLog(
+            self.dates[key], self.bars[key], self.types[key], self.prices[key],
+            self.holdings[key], self.cash[key], self.buy_counts[key], self.shares[key]
+        )
+
+    @property
+    def is_buy(self):
+        return self.types == BUY
+
+    @property
+    def is_sell(self):
+        return self.types == SELL
+
+    def to_frame(self):
+        """
+        날짜 인덱스의 DataFrame으로 변환합니다. (숫자 컬럼은 배열을 그대로 공유)
+
+        Returns:
+          DataFrame: 인덱스 'Date', 컬럼 Type, Price, Holdings, Cash, Buy_Count, Shares
+        """
+        return pd.DataFrame(
+            {
+                'Type': pd.Categorical.from_codes(self.types, categories=TYPE_NAMES),
+                'Price': self.prices,
+                'Holdings': self.holdings,
+                'Cash': self.cash,
+                'Buy_Count': self.buy_counts,
+                'Shares': self.shares,
+            },
+            index=pd.DatetimeIndex(self.dates, name='Date'),
+            copy=False
+        )
+
+    def to_dicts(self):
+        """ 예전 형식(거래마다 dict 하나)의 매매 내역 리스트로 변환합니다. """
+        return [
+            {
+                'Date': date, 'Type': TYPE_NAMES[trade_type], 'Price': price,
+                'Holdings': holdings, 'Cash': cash, 'Buy_Count': buy_count, 'Shares': shares
+            }
+            for date, trade_type, price, holdings, cash, buy_count, shares in zip(
+                pd.DatetimeIndex(self.dates), self.types.tolist(), self.prices.tolist(), self.holdings.tolist(),
+                self.cash.tolist(), self.buy_counts.tolist(), self.shares.tolist()
+            )
+        ]
@@ -0,0 +1,255 @@
+# trading_calendar.py
+# KRX 영업일 달력 (디스크에 저장하고 모자란 구간만 받아 와서 이전/다음 영업일을 O(1)에 조회)
+import datetime
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pykrx.website import krx
+
+from config import CALENDAR_PATH, CALENDAR_START, CALENDAR_TODAY_REFRESH
+from logger import logger
+from range_fetcher import fetch_date_range
+
+_ONE_DAY = np.timedelta64(1, "D")
+
+# 조회 구간이 이 평일 수 이상인데 영업일이 하나도 없으면 (연휴로는 불가능하므로) 조회 실패로 봅니다.
+_MIN_WEEKDAYS_FOR_EMPTY_CHECK = 10
+
+
+def _to_day(date):
+    """ 'YYYYMMDD'/'YYYY-MM-DD' 문자열, datetime, Timestamp를 datetime64[D]로 바꿉니다. (None이면 오늘) """
+    if date is None:
+        return np.datetime64(datetime.date.today(), "D")
+    if isinstance(date, str):
+        date = date.replace("-", "").replace("/", "")
+    return np.datetime64(pd.Timestamp(date).date(), "D")
+
+
+def _fetch_trading_days(start, end):
+    """ 코스피 지수(1001) 일봉이 있는 날짜를 [start, end] 구간의 영업일로 받아 옵니다. (긴 구간은 나눠서 동시에) """
+    fromdate = pd.Timestamp(start).strftime("%Y%m%d")
+    todate = pd.Timestamp(end).strftime("%Y%m%d")
+    df = fetch_date_range(krx.get_index_ohlcv_by_date, fromdate, todate, "1001")
+    return np.asarray(pd.DatetimeIndex(df.index).values.astype("M8[D]"))
+
+
+class TradingCalendar:
+    """
+    영업일 목록(datetime64[D])과, 저장된 구간의 하루하루마다 "그날까지의 마지막 영업일 번호"를 미리 계산한 배열을 둡니다.
+    이전/다음 영업일, 영업일 여부는 배열 한 번 참조로, 기간 조회는 슬라이스 한 번으로 답합니다.
+    저장 구간 밖을 물으면 모자란 앞/뒤 구간만 받아 와 합치고 파일에 다시 저장합니다.
+    오늘은 장 시작 전에는 영업일로 잡히지 않으므로 파일에는 어제까지만 저장하고, 오늘 여부는 refresh_interval초마다 다시 확인합니다.
+    받아 올 수 없는 날짜(미래, 조회 실패)는 평일을 영업일로 가정합니다.
+    """
+
+    def __init__(self, path=None, start=CALENDAR_START, refresh_interval=CALENDAR_TODAY_REFRESH, fetch=_fetch_trading_days):
+        self.path = path
+        self.start = _to_day(start)
+        self.refresh_interval = refresh_interval
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._today_checked_at = None
+        self._failed_at = None
+        self._set(np.empty(0, dtype="M8[D]"), None, None)
+        self._load()
+
+    # ---- 내부 상태 ----
+
+    def _set(self, days, first, last):
+        """ 영업일 목록과 저장 구간 [first, last]로 조회용 배열을 다시 만듭니다. (읽는 쪽은 튜플 하나만 참조) """
+        days = np.unique(days)
+        if first is None:
+            self._snapshot = (days, None, None, None)
+            return
+        span = np.arange(first, last + _ONE_DAY, dtype="M8[D]")
+        # prev_index[d - first] = d 이하인 마지막 영업일의 days 내 번호 (없으면 -1)
+        prev_index = np.searchsorted(days, span, side="right") - 1
+        self._snapshot = (days, first, last, prev_index)
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                days, first, last = data["days"].astype("M8[D]"), data["first"].astype("M8[D]"), data["last"].astype("M8[D]")
+        except (OSError, KeyError, ValueError):
+            return
+        self._set(days, first[()], last[()])
+
+    def _save(self):
+        if self.path is None:
+            return
+        days, first, last, _ = self._snapshot
+        yesterday = _to_day(None) - _ONE_DAY
+        if first is None or first > yesterday:
+            return
+        last = min(last, yesterday)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, days=days[days <= last], first=np.array(first), last=np.array(last))
+        os.replace(tmp_path, self.path)
+
+    def _fetch_range(self, start, end):
+        """
+        [start, end] 영업일을 받아 옵니다. 실패하면 경고만 남기고 None을 반환하며,
+        refresh_interval초 동안은 다시 요청하지 않습니다. (그동안은 평일 가정으로 답함)
+        """
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.refresh_interval:
+            return None
+        try:
+            days = self._fetch(start, end)
+        except Exception as e:
+            logger.warning(f"영업일 조회 실패 ({start}~{end}): {e}")
+            days = None
+        else:
+            if len(days) == 0 and np.busday_count(start, end + _ONE_DAY) >= _MIN_WEEKDAYS_FOR_EMPTY_CHECK:
+                logger.warning(f"영업일 조회 결과가 비어 있습니다 ({start}~{end})")
+                days = None
+        self._failed_at = time.monotonic() if days is None else None
+        return days
+
+    def _ensure(self, lo, hi):
+        """ [lo, hi] 중 오늘까지의 날짜가 저장 구간에 들어오도록 모자란 앞/뒤 구간을 받아 옵니다. (뒤쪽은 오늘까지 한 번에) """
+        today = _to_day(None)
+        hi = min(hi, today)
+        lo = min(lo, self.start)
+        if lo > hi:
+            return
+        with self._lock:
+            days, first, last, _ = self._snapshot
+            stale_today = (
+                last is not None and last == today and hi == today
+                and time.monotonic() - self._today_checked_at >= self.refresh_interval
+            )
+            if first is not None and first <= lo and hi <= last and not stale_today:
+                return
+
+            if first is None:
+                fetched = self._fetch_range(lo, today)
+                if fetched is None:
+                    return
+                first, last, days = lo, today, fetched
+            else:
+                if stale_today:
+                    # 오늘 여부만 다시 확인합니다.
+                    days, last = days[days < today], today - _ONE_DAY
+                if lo < first:
+                    fetched = self._fetch_range(lo, first - _ONE_DAY)
+                    if fetched is not None:
+                        days, first = np.concatenate([fetched, days]), lo
+                if hi > last:
+                    fetched = self._fetch_range(last + _ONE_DAY, today)
+                    if fetched is not None:
+                        days, last = np.concatenate([days, fetched]), today
+            if last == today:
+                self._today_checked_at = time.monotonic()
+            self._set(days, first, last)
+            self._save()
+
+    # ---- 조회 ----
+
+    @staticmethod
+    def _prev_index(snapshot, day):
+        """ day 이하인 마지막 영업일의 번호 (저장 구간 밖이면 None) """
+        days, first, last, prev_index = snapshot
+        if first is None or day < first or day > last:
+            return None
+        return int(prev_index[(day - first).astype(np.int64)])
+
+    def is_trading_day(self, date=None):
+        """ date가 영업일인지 반환합니다. """
+        day = _to_day(date)
+        self._ensure(day, day)
+        snapshot = self._snapshot
+        i = self._prev_index(snapshot, day)
+        if i is None:
+            return bool(np.is_busday(day))
+        return i >= 0 and snapshot[0][i] == day
+
+    def previous(self, date=None, inclusive=True):
+        """
+        date 이전(inclusive이면 date 포함)의 가장 가까운 영업일을 'YYYYMMDD'로 반환합니다.
+        """
+        day = _to_day(date)
+        if not inclusive:
+            day = day - _ONE_DAY
+        self._ensure(day - np.timedelta64(31, "D"), day)
+        snapshot = self._snapshot
+        days, first, last, _ = snapshot
+        if last is not None and day > last:
+            # 저장 구간 뒤(미래 등)는 평일을 영업일로 가정합니다.
+            guess = np.busday_offset(day, 0, roll="backward")
+            if guess > last:
+                return pd.Timestamp(guess).strftime("%Y%m%d")
+            day = last
+        i = self._prev_index(snapshot, day)
+        if i is None or i < 0:
+            return pd.Timestamp(np.busday_offset(day, 0, roll="backward")).strftime("%Y%m%d")
+        return pd.Timestamp(days[i]).strftime("%Y%m%d")
+
+    def next(self, date=None, inclusive=True):
+        """
+        date 이후(inclusive이면 date 포함)의 가장 가까운 영업일을 'YYYYMMDD'로 반환합니다.
+        """
+        day = _to_day(date)
+        if not inclusive:
+            day = day + _ONE_DAY
+        self._ensure(day, day + np.timedelta64(31, "D"))
+        snapshot = self._snapshot
+        days, first, last, _ = snapshot
+        i = self._prev_index(snapshot, day)
+        if i is not None:
+            if i >= 0 and days[i] == day:
+                return pd.Timestamp(day).strftime("%Y%m%d")
+            if i + 1 < len(days) and days[i + 1] <= last:
+                return pd.Timestamp(days[i + 1]).strftime("%Y%m%d")
+            day = last + _ONE_DAY
+        return pd.Timestamp(np.busday_offset(day, 0, roll="forward")).strftime("%Y%m%d")
+
+    def days(self, fromdate, todate):
+        """
+        [fromdate, todate] 기간의 영업일을 Timestamp 리스트로 반환합니다.
+        """
+        lo, hi = _to_day(fromdate), _to_day(todate)
+        if lo > hi:
+            return []
+        self._ensure(lo, hi)
+        snapshot = self._snapshot
+        days, first, last, _ = snapshot
+        parts = []
+        if first is None:
+            first = last = hi + _ONE_DAY
+        if lo < first:
+            weekdays = np.arange(lo, min(hi + _ONE_DAY, first), dtype="M8[D]")
+            parts.append(weekdays[np.is_busday(weekdays)])
+        if lo <= last and hi >= first:
+            i = self._prev_index(snapshot, lo - _ONE_DAY) if lo > first else -1
+            j = self._prev_index(snapshot, min(hi, last))
+            parts.append(days[i + 1:j + 1])
+        if hi > last:
+            weekdays = np.arange(max(lo, last + _ONE_DAY), hi + _ONE_DAY, dtype="M8[D]")
+            parts.append(weekdays[np.is_busday(weekdays)])
+        return list(pd.DatetimeIndex(np.concatenate(parts) if parts else []))
+
+    def month_days(self, year, month):
+        """ year년 month월의 영업일을 Timestamp 리스트로 반환합니다. """
+        first = datetime.date(year, month, 1)
+        last = (pd.Timestamp(first) + pd.offsets.MonthEnd(0)).date()
+        return self.days(first, last)
+
+
+_trading_calendar = None
+_trading_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar():
+    """ 프로세스 전체에서 공유하는 KRX 영업일 달력을 반환합니다. """
+    global _trading_calendar
+    with _trading_calendar_lock:
+        if _trading_calendar is None:
+            _trading_calendar = TradingCalendar(CALENDAR_PATH)
+        return _trading_calendar
@@ -7,16 +7,18 @@ import numpy as np
 def plot_candlestick_with_signals(df, trade_history, target_ticker):
     """
     캔들 차트에 매매 시점을 표시하는 함수입니다.
+    trade_history는 df로 실행한 백테스트의 TradeLog입니다.
     """
     df_candle = df.rename(columns={'시가': 'Open', '고가': 'High', '저가': 'Low', '종가': 'Close'})
-    buy_signals = pd.Series(np.nan, index=df_candle.index)
-    sell_signals = pd.Series(np.nan, index=df_candle.index)
-
-    for trade in trade_history:
-        if trade['Type'] == 'Buy':
-            buy_signals.loc[trade['Date']] = trade['Price']
-        elif trade['Type'] == 'Sell':
-            sell_signals.loc[trade['Date']] = trade['Price']
+    is_buy = trade_history.is_buy
+    is_sell = trade_history.is_sell
+    # 같은 날 여러 번 거래하면 마지막 거래 가격이 표시됩니다.
+    buy_values = np.full(len(df_candle), np.nan)
+    buy_values[trade_history.bars[is_buy]] = trade_history.prices[is_buy]
+    sell_values = np.full(len(df_candle), np.nan)
+    sell_values[trade_history.bars[is_sell]] = trade_history.prices[is_sell]
+    buy_signals = pd.Series(buy_values, index=df_candle.index)
+    sell_signals = pd.Series(sell_values, index=df_candle.index)
 
     apds = []
     if not buy_signals.dropna().empty:
@@ -34,11 +36,14 @@ def plot_candlestick_with_signals(df, trade_history, target_ticker):
         ylabel='Price (KRW)'
     )
     # 거래 내역에 따른 텍스트 표시
-    for trade in trade_history:
-        if trade['Type'] == 'Buy':
+    trades = zip(
+        pd.DatetimeIndex(trade_history.dates), is_buy.tolist(), trade_history.prices.tolist(), trade_history.buy_counts.tolist()
+    )
+    for date, buy, price, buy_count in trades:
+        if buy:
             ax[0].annotate(
-                f"{int(trade['Buy_Count'])}차 매수",
-                xy=(trade['Date'], trade['Price']),
+                f"{buy_count}차 매수",
+                xy=(date, price),
                 xytext=(0, 10),
                 textcoords='offset points',
                 color='green',
@@ -47,10 +52,10 @@ def plot_candlestick_with_signals(df, trade_history, target_ticker):
                 clip_on=False,
                 zorder=10
             )
-        elif trade['Type'] == 'Sell':
+        else:
             ax[0].annotate(
-                f"{int(trade['Buy_Count'])}차 매도",
-                xy=(trade['Date'], trade['Price']),
+                f"{buy_count}차 매도",
+                xy=(date, price),
                 xytext=(0, -15),
                 textcoords='offset points',
                 color='red',